@@ -0,0 +1,154 @@
+"""
+Benchmark transfer profiles: bytes on the wire and latency per setting.
+
+For every combination of size, format, quality (and gzip, if asked) this
+encodes the given images the way the pipeline would, and reports the
+payload size, the gzipped size, and the encode time. With --backend it also
+sends each payload to that backend and reports end-to-end latency and how
+far the score moves from the baseline (today's 1024px JPEG-90 payload).
+
+Examples:
+    python benchmark_transfer.py photos/
+    python benchmark_transfer.py photos/ --backend render --sizes 224,384,0 --gzip
+"""
+import argparse
+import asyncio
+import gzip
+import itertools
+import os
+import sys
+import time
+
+import numpy as np
+
+import config
+from services.transfer import TransferProfile, encode_image, set_profile
+from utils.image_processing import validate_image_bytes
+
+# What the pipeline sent before transfer profiles existed
+BASELINE = TransferProfile(size=0, format="jpeg", quality=90)
+
+
+def find_images(paths: list) -> list:
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for folder, _, names in os.walk(path):
+                files.extend(os.path.join(folder, n) for n in sorted(names))
+        else:
+            files.append(path)
+    return [f for f in files if f.rsplit(".", 1)[-1].lower() in config.IMAGE_EXTENSIONS]
+
+
+def _int_list(text: str) -> list:
+    return [int(v) for v in text.split(",") if v.strip()]
+
+
+async def measure(profile: TransferProfile, images: list, backend=None, baseline_scores=None) -> dict:
+    """Encode (and optionally score) every image with one profile."""
+    payload_bytes, gzip_bytes, encode_ms, score_ms, total_ms, scores = [], [], [], [], [], []
+    if backend is not None:
+        set_profile(backend.name, profile)
+
+    for name, contents in images:
+        start = time.perf_counter()
+        payload = encode_image(contents, profile)
+        encoded = time.perf_counter()
+        payload_bytes.append(len(payload))
+        gzip_bytes.append(len(gzip.compress(payload, compresslevel=6)))
+        encode_ms.append((encoded - start) * 1000)
+
+        if backend is not None:
+            # Straight to the backend, so the score cache cannot hide the latency
+            result = await backend.score(payload, name)
+            done = time.perf_counter()
+            score_ms.append((done - encoded) * 1000)
+            total_ms.append((done - start) * 1000)
+            scores.append(result["score"] if "error" not in result else np.nan)
+
+    row = {
+        "profile": profile.describe(),
+        "kb": np.mean(payload_bytes) / 1024,
+        "wire_kb": np.mean(gzip_bytes if profile.gzip else payload_bytes) / 1024,
+        "gzip_saving": 1 - np.sum(gzip_bytes) / np.sum(payload_bytes),
+        "encode_ms": np.mean(encode_ms),
+    }
+    if backend is not None:
+        row["score_ms"] = np.mean(score_ms)
+        row["total_ms"] = np.mean(total_ms)
+        row["total_p95_ms"] = np.percentile(total_ms, 95)
+        row["scores"] = np.array(scores, dtype=np.float64)
+        if baseline_scores is not None:
+            row["score_delta"] = np.nanmean(np.abs(row["scores"] - baseline_scores))
+    return row
+
+
+async def run(args) -> list:
+    images = []
+    for path in find_images(args.paths):
+        with open(path, "rb") as f:
+            contents = f.read()
+        # Same checks as the API, so one broken file cannot stop the benchmark
+        check = validate_image_bytes(contents)
+        if not check["valid"]:
+            print(f"[Benchmark] Skipping {path}: {check['error']}")
+            continue
+        images.append((os.path.basename(path), contents))
+    if not images:
+        print("[Benchmark] No images found.")
+        return []
+    print(f"[Benchmark] {len(images)} images, {np.mean([len(c) for _, c in images]) / 1024:.1f} KB average upload")
+
+    backend = None
+    if args.backend:
+        from services.backends import get_backend
+
+        backend = get_backend(args.backend)
+
+    baseline = await measure(BASELINE, images, backend)
+    rows = [baseline]
+    gzip_options = [False, True] if args.gzip else [False]
+    for size, image_format, quality, use_gzip in itertools.product(
+        _int_list(args.sizes), args.formats.split(","), _int_list(args.qualities), gzip_options
+    ):
+        profile = TransferProfile(size=size, format=image_format.strip(), quality=quality, gzip=use_gzip)
+        if profile == BASELINE:
+            continue
+        rows.append(await measure(profile, images, backend, baseline.get("scores")))
+    return rows
+
+
+def print_table(rows: list):
+    scored = "total_ms" in rows[0]
+    header = f"{'profile':<42} {'KB':>8} {'wire KB':>8} {'gzip':>6} {'encode':>8}"
+    if scored:
+        header += f" {'backend':>9} {'total':>8} {'p95':>8} {'|dscore|':>9}"
+    print(header)
+    for row in rows:
+        line = (f"{row['profile']:<42} {row['kb']:>8.1f} {row['wire_kb']:>8.1f} "
+                f"{row['gzip_saving']:>6.1%} {row['encode_ms']:>6.1f}ms")
+        if scored:
+            line += (f" {row['score_ms']:>7.1f}ms {row['total_ms']:>6.1f}ms {row['total_p95_ms']:>6.1f}ms"
+                     f" {row.get('score_delta', 0.0):>9.4f}")
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare transfer profiles by payload size and latency.")
+    parser.add_argument("paths", nargs="+", help="Image files or folders")
+    parser.add_argument("--sizes", default="224,384,512", help="Shortest sides to try (0 = MAX_IMAGE_SIDE only)")
+    parser.add_argument("--formats", default="jpeg,webp", help="Formats to try")
+    parser.add_argument("--qualities", default="75,90", help="Qualities to try")
+    parser.add_argument("--gzip", action="store_true", help="Also try each setting with a gzipped body")
+    parser.add_argument("--backend", help="Also score every payload with this backend")
+    args = parser.parse_args(argv)
+
+    rows = asyncio.run(run(args))
+    if not rows:
+        return 1
+    print_table(rows)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
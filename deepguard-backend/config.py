@@ -0,0 +1,105 @@
+import os
+import tempfile
+from dotenv import load_dotenv
+
+# Load settings from .env file
+load_dotenv()
+
+
+def _env_int(name: str, default: int) -> int:
+    """Read an integer setting from the environment, falling back to default."""
+    value = os.getenv(name, "")
+    try:
+        return int(value) if value else default
+    except ValueError:
+        return default
+
+
+# Which scoring backend the pipeline uses: "huggingface", "render" or "local"
+DETECTOR_BACKEND = os.getenv("DETECTOR_BACKEND", "huggingface").lower()
+
+# Set ENABLE_VIDEO=0 for image-only deployments (OpenCV is never imported)
+ENABLE_VIDEO = os.getenv("ENABLE_VIDEO", "1") != "0"
+
+# Verdict thresholds on the (calibrated) fake score:
+# above FAKE_THRESHOLD -> FAKE, below REAL_THRESHOLD -> REAL, else SUSPICIOUS
+FAKE_THRESHOLD = float(os.getenv("FAKE_THRESHOLD", "0.65"))
+REAL_THRESHOLD = float(os.getenv("REAL_THRESHOLD", "0.35"))
+
+# Per-backend score calibrators written by evaluate.py (see services/calibration.py)
+CALIBRATION_PATH = os.getenv("CALIBRATION_PATH", "calibration.json")
+
+# Upload limits shared by /analyze and /detect
+IMAGE_EXTENSIONS = {"jpg", "jpeg", "png", "webp"}
+VIDEO_EXTENSIONS = {"mp4"} if ENABLE_VIDEO else set()
+ALLOWED_EXTENSIONS = IMAGE_EXTENSIONS | VIDEO_EXTENSIONS
+MAX_FILE_SIZE_MB = _env_int("MAX_FILE_SIZE_MB", 20)
+MAX_FILE_SIZE = MAX_FILE_SIZE_MB * 1024 * 1024
+
+# Budgets checked from the image header before an upload is decoded
+# (a small PNG can otherwise decode to gigabytes of pixels)
+MAX_IMAGE_PIXELS = _env_int("MAX_IMAGE_PIXELS", 40_000_000)
+MAX_IMAGE_DIMENSION = _env_int("MAX_IMAGE_DIMENSION", 16384)
+MAX_IMAGE_FRAMES = _env_int("MAX_IMAGE_FRAMES", 100)
+
+# Longest side of an image before it is sent to a backend
+MAX_IMAGE_SIDE = _env_int("MAX_IMAGE_SIDE", 1024)
+
+# How images are shrunk and encoded before they are sent to each backend
+# (see services/transfer.py): "size=384,format=webp,quality=85,gzip=1".
+# size is the shortest side sent (0 = only MAX_IMAGE_SIDE applies)
+TRANSFER_PROFILES = {
+    "huggingface": os.getenv("TRANSFER_HUGGINGFACE", "size=384,format=jpeg,quality=90"),
+    "render": os.getenv("TRANSFER_RENDER", "size=384,format=jpeg,quality=90"),
+    "local": os.getenv("TRANSFER_LOCAL", ""),
+}
+
+# Number of evenly spaced frames sampled from a video
+VIDEO_SAMPLE_FRAMES = _env_int("VIDEO_SAMPLE_FRAMES", 8)
+
+# Decode videos in a worker "thread", or in a separate "process" that hands
+# raw frames back through a shared-memory ring of VIDEO_RING_SLOTS slots
+VIDEO_DECODER = os.getenv("VIDEO_DECODER", "thread").lower()
+VIDEO_RING_SLOTS = _env_int("VIDEO_RING_SLOTS", 4)
+
+# Temporal (flicker / face jitter) and audio-track signals for videos.
+# TEMPORAL_WEIGHT is how much the temporal score counts in the final score;
+# it stays 0 (signals are reported, not blended in) until a weight has been
+# fitted on labelled data. Audio features are only reported (they never
+# affect the score) and cost a second read of the file, so they are opt-in.
+TEMPORAL_ANALYSIS = os.getenv("TEMPORAL_ANALYSIS", "1") != "0"
+TEMPORAL_WEIGHT = float(os.getenv("TEMPORAL_WEIGHT", "0") or 0)
+AUDIO_ANALYSIS = os.getenv("AUDIO_ANALYSIS", "0") == "1"
+
+# How many backend scores are kept in memory (keyed by content hash)
+SCORE_CACHE_SIZE = _env_int("SCORE_CACHE_SIZE", 512)
+
+# Maximum number of backend calls in flight per worker
+BACKEND_CONCURRENCY = _env_int("BACKEND_CONCURRENCY", 4)
+
+# Load heavy dependencies in parallel at startup (1) or on first request (0)
+PRELOAD_ON_STARTUP = os.getenv("PRELOAD_ON_STARTUP", "1") != "0"
+
+# DETECTOR_BACKEND=local runs this HuggingFace model in-process (needs transformers + torch)
+LOCAL_MODEL_NAME = os.getenv("LOCAL_MODEL_NAME", "umm-maybe/AI-image-detector")
+
+# Torch threads per worker, so N workers don't oversubscribe the CPU cores
+LOCAL_TORCH_THREADS = _env_int("LOCAL_TORCH_THREADS", 1)
+
+# SQLite file that keeps every verdict (set STORE_PATH= to turn the store off)
+STORE_PATH = os.getenv("STORE_PATH", "deepguard.db")
+
+# Answer repeat uploads of the same file from the store instead of re-scoring
+STORE_REUSE_RESULTS = os.getenv("STORE_REUSE_RESULTS", "1") != "0"
+
+# Model version recorded for the Render API (defaults to MODEL_API_URL)
+MODEL_VERSION = os.getenv("MODEL_VERSION", "")
+
+# Resumable chunked uploads (/uploads): where chunks are assembled, the
+# largest file accepted, the largest single PATCH, and how long unfinished
+# uploads are kept
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", os.path.join(tempfile.gettempdir(), "deepguard-uploads"))
+MAX_UPLOAD_SIZE_MB = _env_int("MAX_UPLOAD_SIZE_MB", 500)
+MAX_UPLOAD_SIZE = MAX_UPLOAD_SIZE_MB * 1024 * 1024
+MAX_CHUNK_SIZE_MB = _env_int("MAX_CHUNK_SIZE_MB", 16)
+UPLOAD_TTL_HOURS = _env_int("UPLOAD_TTL_HOURS", 24)
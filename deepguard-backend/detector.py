@@ -1,18 +1,28 @@
 import os
 from dotenv import load_dotenv
-from huggingface_hub import InferenceClient
 
 # Load API keys from .env file
 load_dotenv()
 HF_API_KEY = os.getenv("HF_API_KEY")
 
-# Set up the HuggingFace client
-client = InferenceClient(token=HF_API_KEY)
+# The HuggingFace client is created on first use (see get_client), so
+# importing this module stays cheap and huggingface_hub loads lazily.
+_client = None
 
 # Model that detects AI-generated vs real images (works on free tier!)
 MODEL_NAME = "umm-maybe/AI-image-detector"
 
 
+def get_client():
+    """Return the shared HuggingFace InferenceClient, creating it on first use."""
+    global _client
+    if _client is None:
+        from huggingface_hub import InferenceClient
+
+        _client = InferenceClient(token=HF_API_KEY)
+    return _client
+
+
 def detect_deepfake(image_path: str) -> dict:
     """
     Send an image to HuggingFace's AI image detector model
@@ -28,6 +38,15 @@ def detect_deepfake(image_path: str) -> dict:
     file_size = os.path.getsize(image_path)
     print(f"[Step 1] Image found ({file_size} bytes)")
 
+    return classify_image(image_path)
+
+
+def classify_image(image) -> dict:
+    """
+    Send an image (file path or raw bytes) to the HuggingFace model
+    and return {"score", "verdict"} plus "error" if something failed.
+    """
+
     # Step 2: Check API key
     print(f"[Step 2] API key loaded: {'Yes' if HF_API_KEY else 'NO — key is missing!'}")
     if not HF_API_KEY:
@@ -39,7 +58,7 @@ def detect_deepfake(image_path: str) -> dict:
     for attempt in range(1, max_retries + 1):
         try:
             print(f"[Step 3] Attempt {attempt}/{max_retries}...")
-            result = client.image_classification(image_path, model=MODEL_NAME)
+            result = get_client().image_classification(image, model=MODEL_NAME)
             print(f"[Step 4] HuggingFace response: {result}")
             break
         except Exception as e:
@@ -60,25 +79,11 @@ def detect_deepfake(image_path: str) -> dict:
         return {"score": 0.5, "verdict": "SUSPICIOUS", "error": "Model loading timeout"}
 
     # Step 5: Find the "artificial" (fake) score
-    fake_score = 0.5  # default
-    for item in result:
-        label = item.label.lower()
-        if "artificial" in label or "fake" in label or "deepfake" in label:
-            fake_score = round(item.score, 4)
-            break
-        elif "human" in label or "real" in label:
-            # If we find the "real/human" score, Fake = 1 - Real
-            fake_score = round(1.0 - item.score, 4)
-            break
+    fake_score = parse_fake_score(result)
     print(f"[Step 5] Fake/AI score: {fake_score}")
 
     # Step 6: Determine the verdict
-    if fake_score > 0.65:
-        verdict = "FAKE"
-    elif fake_score < 0.35:
-        verdict = "REAL"
-    else:
-        verdict = "SUSPICIOUS"
+    verdict = score_to_verdict(fake_score)
     print(f"[Step 6] Verdict: {verdict}")
 
     # Step 7: Return the result
@@ -87,6 +92,44 @@ def detect_deepfake(image_path: str) -> dict:
     return final
 
 
+def parse_fake_score(result) -> float:
+    """
+    Turn a list of {label, score} predictions into a fake probability.
+    Items can be HuggingFace output objects or plain dicts (local model).
+    All labels count: fake-like and real-like scores are summed, and the
+    fake share of the two is returned.
+    """
+    fake_total, real_total = 0.0, 0.0
+    found_fake, found_real = False, False
+    for item in result:
+        if isinstance(item, dict):
+            label, item_score = item["label"].lower(), item["score"]
+        else:
+            label, item_score = item.label.lower(), item.score
+        if "artificial" in label or "fake" in label or "deepfake" in label:
+            fake_total += item_score
+            found_fake = True
+        elif "human" in label or "real" in label:
+            real_total += item_score
+            found_real = True
+
+    if found_fake and found_real and fake_total + real_total > 0:
+        return round(fake_total / (fake_total + real_total), 4)
+    if found_fake:
+        return round(min(fake_total, 1.0), 4)
+    if found_real:
+        # If we only find the "real/human" score, Fake = 1 - Real
+        return round(max(1.0 - real_total, 0.0), 4)
+    return 0.5  # default
+
+
+def score_to_verdict(fake_score: float) -> str:
+    """Map a fake probability to FAKE, REAL, or SUSPICIOUS (thresholds from config)."""
+    from services.calibration import score_to_verdict as verdict_for
+
+    return verdict_for(fake_score)
+
+
 # --- Quick test (only runs if you execute this file directly) ---
 if __name__ == "__main__":
     import sys
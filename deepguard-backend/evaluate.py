@@ -0,0 +1,325 @@
+"""
+Offline evaluation of the detection pipeline on a labeled local dataset.
+
+Scores every file through the same pipeline the API uses (uncalibrated,
+without the verdict store), then reports ROC/AUC, a threshold trade-off
+table, the verdict mix at the configured thresholds and per-stage timing.
+Optionally fits a Platt or isotonic calibrator for the backend (its
+metrics are cross-validated) and saves it to CALIBRATION_PATH.
+
+Dataset layout: files inside folders named "real" and "fake" (at any depth),
+or any folder plus a CSV of "path,label" rows (label: real/fake or 0/1).
+
+Examples:
+    python evaluate.py data/ --batch-size 16
+    python evaluate.py data/ --scores-out scores.csv --fit isotonic --save
+    python evaluate.py --scores-in scores.csv --fit platt
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+import config
+
+STAGES = ["ingest", "validate", "preprocess", "score"]
+
+
+# ---------------------------------------------------------------- dataset
+
+
+def _label_from_text(text: str):
+    text = str(text).strip().lower()
+    if text in ("fake", "1", "ai", "artificial", "deepfake"):
+        return 1
+    if text in ("real", "0", "human", "authentic"):
+        return 0
+    return None
+
+
+def find_dataset(root: str, labels_csv: str = None) -> list:
+    """Return [(path, label)] for every supported file in the dataset."""
+    items = []
+    if labels_csv:
+        with open(labels_csv, newline="") as f:
+            for row in csv.reader(f):
+                if len(row) < 2 or _label_from_text(row[1]) is None:
+                    continue
+                path = row[0] if os.path.isabs(row[0]) else os.path.join(root, row[0])
+                items.append((path, _label_from_text(row[1])))
+        return items
+
+    for folder, _, files in os.walk(root):
+        parts = [p.lower() for p in os.path.relpath(folder, root).split(os.sep)]
+        label = next((1 if p == "fake" else 0 for p in reversed(parts) if p in ("fake", "real")), None)
+        if label is None:
+            continue
+        for name in sorted(files):
+            ext = name.rsplit(".", 1)[-1].lower() if "." in name else ""
+            if ext in config.ALLOWED_EXTENSIONS:
+                items.append((os.path.join(folder, name), label))
+    return items
+
+
+# ---------------------------------------------------------------- scoring
+
+
+async def _score_file(path: str, label: int, backend: str) -> dict:
+    from services.pipeline import PipelineError, analyze_stream, prepare
+
+    with open(path, "rb") as f:
+        contents = f.read()
+    try:
+        analysis = prepare(os.path.basename(path), contents)
+    except PipelineError as e:
+        return {"path": path, "label": label, "error": e.message}
+
+    start = time.perf_counter()
+    async for _ in analyze_stream(analysis, backend, explain_result=False):
+        pass
+    return {
+        "path": path,
+        "label": label,
+        "raw_score": analysis.raw_score,
+        "frames": len(analysis.frame_scores),
+        "error": "; ".join(analysis.errors) if not analysis.frame_scores else "",
+        "total_ms": (time.perf_counter() - start) * 1000,
+        "timings": analysis.timings,
+    }
+
+
+async def score_dataset(items: list, backend: str, batch_size: int) -> list:
+    """Score files batch_size at a time, printing throughput as it goes."""
+    results = []
+    start = time.perf_counter()
+    for i in range(0, len(items), batch_size):
+        batch = items[i:i + batch_size]
+        results.extend(await asyncio.gather(*[_score_file(p, l, backend) for p, l in batch]))
+        elapsed = time.perf_counter() - start
+        print(f"[Evaluate] {len(results)}/{len(items)} files, {len(results) / elapsed:.2f} files/s")
+    return results
+
+
+def write_scores(path: str, results: list):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["path", "label", "raw_score", "frames", "error"])
+        for r in results:
+            writer.writerow([r["path"], r["label"], r.get("raw_score", ""), r.get("frames", 0), r.get("error", "")])
+
+
+def read_scores(path: str) -> list:
+    results = []
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            results.append({
+                "path": row["path"],
+                "label": int(row["label"]),
+                "raw_score": float(row["raw_score"]) if row["raw_score"] else None,
+                "error": row.get("error", ""),
+            })
+    return results
+
+
+# ---------------------------------------------------------------- metrics
+
+
+def roc_curve(scores: np.ndarray, labels: np.ndarray) -> tuple:
+    """(fpr, tpr, thresholds) with one point per distinct score, plus AUC."""
+    order = np.argsort(-scores, kind="mergesort")
+    scores, labels = scores[order], labels[order]
+    # Last index of each run of equal scores
+    distinct = np.r_[np.where(np.diff(scores))[0], len(scores) - 1]
+    tps = np.cumsum(labels)[distinct]
+    fps = np.cumsum(1 - labels)[distinct]
+    tpr = np.r_[0.0, tps / max(labels.sum(), 1)]
+    fpr = np.r_[0.0, fps / max((1 - labels).sum(), 1)]
+    auc = float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2))
+    return fpr, tpr, np.r_[np.inf, scores[distinct]], auc
+
+
+def threshold_table(scores: np.ndarray, labels: np.ndarray, thresholds: np.ndarray) -> dict:
+    """Precision, recall, FPR and accuracy of "fake if score > t" for every t at once."""
+    predicted = scores[None, :] > thresholds[:, None]
+    positive = labels[None, :] == 1
+    tp = (predicted & positive).sum(axis=1)
+    fp = (predicted & ~positive).sum(axis=1)
+    fn = (~predicted & positive).sum(axis=1)
+    tn = (~predicted & ~positive).sum(axis=1)
+    return {
+        "threshold": thresholds,
+        "precision": tp / np.maximum(tp + fp, 1),
+        "recall": tp / np.maximum(tp + fn, 1),
+        "fpr": fp / np.maximum(fp + tn, 1),
+        "accuracy": (tp + tn) / len(labels),
+    }
+
+
+def verdict_mix(scores: np.ndarray, labels: np.ndarray, fake_t: float, real_t: float) -> dict:
+    """How often each verdict is given, and how accurate the decided ones are."""
+    fake = scores > fake_t
+    real = scores < real_t
+    decided = fake | real
+    correct = (fake & (labels == 1)) | (real & (labels == 0))
+    return {
+        "FAKE": float(fake.mean()),
+        "REAL": float(real.mean()),
+        "SUSPICIOUS": float((~decided).mean()),
+        "decided_accuracy": float(correct.sum() / max(decided.sum(), 1)),
+    }
+
+
+def expected_calibration_error(scores: np.ndarray, labels: np.ndarray, bins: int = 10) -> float:
+    which = np.minimum((scores * bins).astype(int), bins - 1)
+    counts = np.bincount(which, minlength=bins)
+    mean_score = np.bincount(which, weights=scores, minlength=bins) / np.maximum(counts, 1)
+    fake_rate = np.bincount(which, weights=labels, minlength=bins) / np.maximum(counts, 1)
+    return float(np.sum(counts * np.abs(mean_score - fake_rate)) / len(scores))
+
+
+def cross_validated(scores: np.ndarray, labels: np.ndarray, fitter, folds: int = 5, seed: int = 0) -> np.ndarray:
+    """
+    Out-of-fold calibrated scores: every file is calibrated by a calibrator
+    fitted on the other folds only, so metrics measured on them estimate how
+    the calibrator does on files it has not seen. Folds are stratified by label.
+    """
+    rng = np.random.default_rng(seed)
+    fold = np.empty(len(labels), dtype=np.int64)
+    for label in (0, 1):
+        members = rng.permutation(np.flatnonzero(labels == label))
+        fold[members] = np.arange(len(members)) % folds
+    calibrated = np.empty(len(scores), dtype=np.float64)
+    for k in range(folds):
+        held_out = fold == k
+        calibrated[held_out] = fitter(scores[~held_out], labels[~held_out]).apply(scores[held_out])
+    return calibrated
+
+
+def timing_report(results: list) -> dict:
+    report = {}
+    for stage in STAGES + ["total"]:
+        key = "total_ms" if stage == "total" else stage
+        values = np.array([
+            r[key] if stage == "total" else r["timings"].get(stage, np.nan)
+            for r in results if "timings" in r
+        ], dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values):
+            report[stage] = {
+                "mean_ms": round(float(values.mean()), 2),
+                "p50_ms": round(float(np.percentile(values, 50)), 2),
+                "p95_ms": round(float(np.percentile(values, 95)), 2),
+            }
+    return report
+
+
+# ---------------------------------------------------------------- main
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate and calibrate the deepfake detector offline.")
+    parser.add_argument("dataset", nargs="?", help="Folder with real/ and fake/ subfolders")
+    parser.add_argument("--labels", help="CSV of path,label rows (instead of real/ and fake/ folders)")
+    parser.add_argument("--backend", default=config.DETECTOR_BACKEND, help="Backend to evaluate")
+    parser.add_argument("--batch-size", type=int, default=8, help="Files scored concurrently per batch")
+    parser.add_argument("--scores-in", help="Reuse raw scores from an earlier --scores-out instead of scoring")
+    parser.add_argument("--scores-out", help="Write raw scores to this CSV")
+    parser.add_argument("--step", type=float, default=0.05, help="Threshold step for the trade-off table")
+    parser.add_argument("--fit", choices=["platt", "isotonic"], help="Fit a calibrator on the raw scores")
+    parser.add_argument("--folds", type=int, default=5, help="Cross-validation folds for the calibrated metrics")
+    parser.add_argument("--save", action="store_true", help="Save the fitted calibrator to CALIBRATION_PATH")
+    parser.add_argument("--report", help="Write the full report as JSON")
+    args = parser.parse_args(argv)
+
+    from services import calibration
+
+    calibration_path = config.CALIBRATION_PATH
+    if args.scores_in:
+        results = read_scores(args.scores_in)
+    else:
+        if not args.dataset:
+            parser.error("give a dataset folder or --scores-in")
+        items = find_dataset(args.dataset, args.labels)
+        if not items:
+            print("[Evaluate] No labeled files found.")
+            return 1
+        print(f"[Evaluate] {len(items)} files ({sum(l for _, l in items)} fake) with backend '{args.backend}'")
+
+        # Raw, uncalibrated scores, and no reads/writes of the verdict store
+        config.STORE_PATH = ""
+        config.CALIBRATION_PATH = ""
+        calibration.reload()
+        results = asyncio.run(score_dataset(items, args.backend, max(1, args.batch_size)))
+        if args.scores_out:
+            write_scores(args.scores_out, results)
+
+    usable = [r for r in results if r.get("raw_score") is not None and not r.get("error")]
+    print(f"[Evaluate] {len(usable)} scored, {len(results) - len(usable)} failed")
+    if not usable or len({r["label"] for r in usable}) < 2:
+        print("[Evaluate] Need scored files of both labels to evaluate.")
+        return 1
+
+    scores = np.array([r["raw_score"] for r in usable], dtype=np.float64)
+    labels = np.array([r["label"] for r in usable], dtype=np.int64)
+
+    _, _, _, auc = roc_curve(scores, labels)
+    table = threshold_table(scores, labels, np.round(np.arange(args.step, 1.0, args.step), 4))
+    report = {
+        "backend": args.backend,
+        "files": len(usable),
+        "auc": round(auc, 4),
+        "ece": round(expected_calibration_error(scores, labels), 4),
+        "verdicts": verdict_mix(scores, labels, config.FAKE_THRESHOLD, config.REAL_THRESHOLD),
+        "thresholds": {k: [round(float(v), 4) for v in values] for k, values in table.items()},
+        "timing": timing_report(usable),
+    }
+
+    print(f"\n=== {args.backend}: AUC {report['auc']}, ECE {report['ece']} ===")
+    print(f"{'threshold':>9} {'precision':>9} {'recall':>7} {'fpr':>6} {'accuracy':>8}")
+    for i, t in enumerate(table["threshold"]):
+        print(f"{t:>9.2f} {table['precision'][i]:>9.3f} {table['recall'][i]:>7.3f} "
+              f"{table['fpr'][i]:>6.3f} {table['accuracy'][i]:>8.3f}")
+    mix = report["verdicts"]
+    print(f"\nAt FAKE>{config.FAKE_THRESHOLD} / REAL<{config.REAL_THRESHOLD}: "
+          f"FAKE {mix['FAKE']:.1%}, REAL {mix['REAL']:.1%}, SUSPICIOUS {mix['SUSPICIOUS']:.1%}, "
+          f"accuracy when decided {mix['decided_accuracy']:.1%}")
+    if report["timing"]:
+        print("\nPer-stage timing (ms):")
+        for stage, t in report["timing"].items():
+            print(f"  {stage:<10} mean {t['mean_ms']:>8}  p50 {t['p50_ms']:>8}  p95 {t['p95_ms']:>8}")
+
+    if args.fit:
+        fitter = calibration.FITTERS[args.fit]
+        # The saved calibrator uses every file; the metrics after calibration
+        # come from held-out folds, since it would look perfect on its own data
+        calibrator = fitter(scores, labels)
+        folds = min(args.folds, int(labels.sum()), int((1 - labels).sum()))
+        report["calibration"] = calibrator.to_dict()
+        if folds >= 2:
+            calibrated = cross_validated(scores, labels, fitter, folds)
+            report["calibration"].update({
+                "folds": folds,
+                "ece_after": round(expected_calibration_error(calibrated, labels), 4),
+                "verdicts_after": verdict_mix(calibrated, labels, config.FAKE_THRESHOLD, config.REAL_THRESHOLD),
+            })
+            print(f"\nFitted {args.fit} calibrator: ECE {report['ece']} -> "
+                  f"{report['calibration']['ece_after']} ({folds}-fold cross-validated)")
+        else:
+            print(f"\nFitted {args.fit} calibrator (too few files of one label to cross-validate it)")
+        if args.save:
+            calibration.save(args.backend, calibrator, calibration_path or "calibration.json")
+            print(f"Saved to {calibration_path or 'calibration.json'}")
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,12 @@
 import os
-import google.generativeai as genai
 from dotenv import load_dotenv
 
 # Load API keys from .env file
 load_dotenv()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-# Configure Gemini
-genai.configure(api_key=GEMINI_API_KEY)
+# google.generativeai is imported and configured on first use (see get_genai)
+_genai = None
 
 # System prompt for the AI forensics expert
 SYSTEM_PROMPT = (
@@ -26,6 +25,17 @@ FALLBACK = {
 }
 
 
+def get_genai():
+    """Import and configure the Gemini SDK once, then return the module."""
+    global _genai
+    if _genai is None:
+        import google.generativeai as genai
+
+        genai.configure(api_key=GEMINI_API_KEY)
+        _genai = genai
+    return _genai
+
+
 def generate_explanation(score: float, verdict: str, file_type: str = "image") -> str:
     """
     Use Gemini to generate a beginner-friendly forensic explanation
@@ -49,6 +59,7 @@ def generate_explanation(score: float, verdict: str, file_type: str = "image") -
     # Step 3: Call Gemini
     try:
         print("[Explainer] Calling Gemini API...")
+        genai = get_genai()
         model = genai.GenerativeModel(
             model_name="gemini-2.0-flash",
             system_instruction=SYSTEM_PROMPT,
@@ -0,0 +1,32 @@
+"""
+Gunicorn settings for serving main:app with uvicorn workers.
+
+With preload_app the app is imported once in the master. For
+DETECTOR_BACKEND=local the master also loads the model weights before
+forking, so all workers share one copy of them instead of one each.
+Remote backends spend their time waiting on the network, which one async
+worker handles fine, so they default to a single worker.
+"""
+import gc
+import os
+
+import config
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "2" if config.DETECTOR_BACKEND == "local" else "1"))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = 120
+preload_app = True
+
+
+def when_ready(server):
+    """Runs in the master after the app is loaded, right before workers fork."""
+    if config.DETECTOR_BACKEND == "local":
+        from services import local_model
+
+        local_model.load_model()
+
+    # Move everything loaded so far out of the GC's reach, so collections in
+    # the workers don't write to (and un-share) the master's memory pages
+    gc.freeze()
+    server.log.info("Preloaded app in master, workers will share its memory")
@@ -1,14 +1,29 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-import os
-import traceback
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 load_dotenv()
-from detector import detect_deepfake
-from explainer import generate_explanation
-from video_utils import extract_frames, cleanup_files
+from routers import detect, results, uploads
+from services import startup
+from services.pipeline import PipelineError, analyze_stream, prepare, run_pipeline, stats
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load heavy dependencies in parallel threads instead of at import time
+    await asyncio.to_thread(startup.warm_up)
+    yield
+    # Close the pooled connections to the model API
+    from services import detector as render_api
+
+    await render_api.close_client()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -16,10 +31,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets browsers read the resumable-upload offset headers
+    expose_headers=["Location", "Upload-Offset", "Upload-Length"],
 )
 
-ALLOWED_EXTENSIONS = {"jpg", "jpeg", "png", "webp", "mp4"}
-MAX_FILE_SIZE = 20 * 1024 * 1024  # 20 MB
+app.include_router(detect.router)
+app.include_router(results.router)
+app.include_router(uploads.router)
 
 
 @app.get("/ping")
@@ -27,91 +45,56 @@ def ping():
     return {"status": "alive"}
 
 
+@app.get("/metrics")
+def metrics():
+    """Per-stage timings, counters and cache stats for the analysis pipeline."""
+    data = stats()
+    data["startup"] = startup.report()
+    return data
+
+
 @app.post("/analyze")
 async def analyze(file: UploadFile = File(...)):
-    # 1. Get filename and extension
-    filename = file.filename or ""
-    ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
-
-    # 2. Validate extension
-    if ext not in ALLOWED_EXTENSIONS:
-        raise HTTPException(
-            status_code=400,
-            detail={"error": "Invalid file type. Allowed: jpg, jpeg, png, webp, mp4"},
-        )
-
-    # 3. Read file and validate size
     contents = await file.read()
-    if len(contents) > MAX_FILE_SIZE:
-        raise HTTPException(
-            status_code=400,
-            detail={"error": "File too large. Maximum size is 20MB"},
-        )
 
-    # 4. Save temporarily
-    if ext == "mp4":
-        temp_path = "temp_upload.mp4"
-    else:
-        temp_path = "temp_upload.jpg"
+    try:
+        analysis = await run_pipeline(file.filename or "", contents)
+    except PipelineError as e:
+        raise HTTPException(status_code=e.status_code, detail={"error": e.message})
+
+    response = {
+        "verdict": analysis.verdict,
+        "score": analysis.score,
+        "explanation": analysis.explanation,
+    }
+    if analysis.signals:
+        response["signals"] = analysis.signals
+    return response
+
 
-    with open(temp_path, "wb") as f:
-        f.write(contents)
+@app.post("/analyze/stream")
+async def analyze_stream_route(file: UploadFile = File(...)):
+    """
+    Same analysis as /analyze, streamed as Server-Sent Events: a "frame"
+    event with the running score and provisional verdict after every scored
+    frame, then a "result" event with the final verdict and explanation.
+    Closing the connection early stops the analysis.
+    """
+    contents = await file.read()
 
     try:
-        if ext == "mp4":
-            file_type = "video"
-            frame_paths = extract_frames(temp_path)
-            
-            if not frame_paths:
-                score = 0.5
-                verdict = "SUSPICIOUS"
-            else:
-                scores = []
-                for frame_path in frame_paths:
-                    result = detect_deepfake(frame_path)
-                    scores.append(result.get("score", 0.5))
-                
-                avg_score = sum(scores) / len(scores)
-                score = round(avg_score, 4)
-                
-                if score > 0.65:
-                    verdict = "FAKE"
-                elif score < 0.35:
-                    verdict = "REAL"
-                else:
-                    verdict = "SUSPICIOUS"
-                
-                cleanup_files(frame_paths)
-                
-        else:
-            file_type = "image"
-            result = detect_deepfake(temp_path)
-            score = result.get("score", 0.5)
-            verdict = result.get("verdict", "SUSPICIOUS")
-            
-        try:
-            explanation = generate_explanation(score, verdict, file_type)
-        except Exception:
-            explanation = "Analysis complete. Manual review recommended."
-            
-        return {
-            "verdict": verdict,
-            "score": score,
-            "explanation": explanation
-        }
-
-    except Exception:
-        # Fallback if anything fails during detection
-        traceback.print_exc()
-        return {
-            "verdict": "SUSPICIOUS",
-            "score": 0.5,
-            "explanation": "Analysis complete. Manual review recommended."
-        }
-    finally:
-        # 6. Always clean up temp file
-        if os.path.exists(temp_path):
-            try:
-                os.remove(temp_path)
-            except Exception:
-                pass
+        # Off the event loop, like run_pipeline: hashing and validation take a while on large files
+        analysis = await asyncio.to_thread(prepare, file.filename or "", contents)
+    except PipelineError as e:
+        raise HTTPException(status_code=e.status_code, detail={"error": e.message})
+
+    async def events():
+        async for event in analyze_stream(analysis):
+            name = event.pop("event")
+            yield f"event: {name}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException
-from utils.image_processing import validate_image, preprocess_image
-from services.detector import detect_deepfake
+
+import config
+from services.pipeline import PipelineError, run_pipeline
 
 router = APIRouter()
 
@@ -9,22 +10,33 @@ router = APIRouter()
 async def detect(file: UploadFile = File(...)):
     """
     Upload an image to check if it is a deepfake.
-    Accepts: jpg, jpeg, png, webp (max 10MB).
-    Returns: prediction result with label and confidence.
+    Accepts: jpg, jpeg, png, webp (max MAX_FILE_SIZE_MB, 20MB by default).
+    Returns: prediction result with verdict and fake score.
     """
-    validation = await validate_image(file)
-    if not validation["valid"]:
-        raise HTTPException(status_code=400, detail=validation["error"])
-
     contents = await file.read()
-    processed_image = preprocess_image(contents)
-    result = await detect_deepfake(processed_image, file.filename or "image.jpg")
 
-    if not result["success"]:
-        raise HTTPException(status_code=502, detail=result["error"])
+    try:
+        analysis = await run_pipeline(
+            file.filename or "image.jpg",
+            contents,
+            allowed_extensions=config.IMAGE_EXTENSIONS,
+            explain_result=False,
+        )
+    except PipelineError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+
+    if not analysis.frame_scores:
+        error = analysis.errors[0] if analysis.errors else "Detection failed"
+        raise HTTPException(status_code=502, detail=error)
 
     return {
         "success": True,
         "filename": file.filename,
-        "result": result["result"],
+        "result": {
+            "verdict": analysis.verdict,
+            "score": analysis.score,
+            "backend": analysis.backend,
+            "raw": analysis.raw[0] if analysis.raw else None,
+            "cached": analysis.cached,
+        },
     }
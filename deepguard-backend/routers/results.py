@@ -0,0 +1,92 @@
+import asyncio
+import csv
+import io
+import json
+from datetime import datetime
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from services import store
+
+router = APIRouter()
+
+
+def parse_time(value: str):
+    """Accept epoch seconds ("1760000000") or ISO 8601 ("2025-10-09T12:00:00")."""
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid time '{value}'. Use epoch seconds or ISO 8601.")
+
+
+def _require_store():
+    if not store.enabled():
+        raise HTTPException(status_code=404, detail="The verdict store is disabled (STORE_PATH is empty).")
+
+
+@router.get("/results")
+async def list_results(
+    sha256: str = None,
+    phash: str = None,
+    since: str = None,
+    until: str = None,
+    limit: int = Query(100, ge=1, le=1000),
+):
+    """
+    Look up past verdicts by file hash, perceptual hash and/or time range.
+    Newest first.
+    """
+    _require_store()
+    rows = await asyncio.to_thread(
+        store.search, sha256, phash, parse_time(since), parse_time(until), limit
+    )
+    return {"count": len(rows), "results": rows}
+
+
+@router.get("/results/export")
+def export_results(since: str = None, until: str = None, format: str = "jsonl"):
+    """
+    Stream every verdict in the time range as JSON Lines or CSV.
+    Rows are read from the database in batches, so exports of any size
+    use a constant amount of memory.
+    """
+    _require_store()
+    if format not in ("jsonl", "csv"):
+        raise HTTPException(status_code=400, detail="format must be 'jsonl' or 'csv'")
+
+    rows = store.iter_rows(parse_time(since), parse_time(until))
+
+    if format == "jsonl":
+        body = (json.dumps(row) + "\n" for row in rows)
+        media_type = "application/x-ndjson"
+    else:
+        body = _csv_lines(rows)
+        media_type = "text/csv"
+
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="verdicts.{format}"'},
+    )
+
+
+def _csv_lines(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(store.COLUMNS)
+    for row in rows:
+        row["timings"] = json.dumps(row.get("timings") or {})
+        writer.writerow([row.get(column) for column in store.COLUMNS])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only, when there are no rows
+    if buffer.tell():
+        yield buffer.getvalue()
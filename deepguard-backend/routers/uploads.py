@@ -0,0 +1,130 @@
+import asyncio
+
+from fastapi import APIRouter, Header, HTTPException, Request, Response
+from pydantic import BaseModel
+
+import config
+from services import uploads
+from services.pipeline import PipelineError, analyze_stream, prepare
+
+router = APIRouter()
+
+
+class NewUpload(BaseModel):
+    filename: str
+    size: int
+
+
+def _http_error(e: Exception) -> HTTPException:
+    return HTTPException(status_code=e.status_code, detail={"error": e.message})
+
+
+@router.post("/uploads", status_code=201)
+def create_upload(body: NewUpload, response: Response):
+    """
+    Start a resumable upload. Send the file afterwards with PATCH requests
+    (see upload_chunk), then POST /uploads/{id}/analyze.
+    """
+    try:
+        result = uploads.create(body.filename, body.size)
+    except uploads.UploadError as e:
+        raise _http_error(e)
+    response.headers["Location"] = f"/uploads/{result['upload_id']}"
+    return result
+
+
+@router.head("/uploads/{upload_id}")
+def upload_offset(upload_id: str):
+    """Report how many bytes were received, so a client can resume."""
+    try:
+        result = uploads.status(upload_id)
+    except uploads.UploadError as e:
+        raise _http_error(e)
+    return Response(
+        headers={
+            "Upload-Offset": str(result["offset"]),
+            "Upload-Length": str(result["size"]),
+            "Cache-Control": "no-store",
+        }
+    )
+
+
+@router.get("/uploads/{upload_id}")
+def upload_status(upload_id: str):
+    try:
+        return uploads.status(upload_id)
+    except uploads.UploadError as e:
+        raise _http_error(e)
+
+
+@router.patch("/uploads/{upload_id}")
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    upload_offset: int = Header(..., alias="Upload-Offset"),
+    upload_checksum: str = Header(..., alias="Upload-Checksum"),
+):
+    """
+    Append the request body at Upload-Offset. Upload-Checksum is
+    "sha256 <digest>" of this chunk. On a 409 (wrong offset) ask HEAD for
+    the real offset; on a 460 (checksum mismatch) resend the same chunk.
+    """
+    try:
+        result = await uploads.append_chunk(upload_id, upload_offset, upload_checksum, request.stream())
+    except uploads.UploadError as e:
+        raise _http_error(e)
+    return Response(
+        status_code=204,
+        headers={"Upload-Offset": str(result["offset"]), "Upload-Length": str(result["size"])},
+    )
+
+
+@router.post("/uploads/{upload_id}/analyze")
+async def analyze_upload(upload_id: str):
+    """Analyze a completed upload (same response as /analyze) and delete it."""
+    try:
+        result = uploads.status(upload_id)
+        meta = uploads.load_meta(upload_id)
+    except uploads.UploadError as e:
+        raise _http_error(e)
+    if not result["complete"]:
+        raise HTTPException(
+            status_code=409,
+            detail={"error": f"Upload incomplete: {result['offset']} of {result['size']} bytes received"},
+        )
+
+    try:
+        # Hashing and validating a large video from disk takes a while; keep it off the event loop
+        analysis = await asyncio.to_thread(
+            prepare, meta["filename"], path=uploads.data_path(meta), max_size=config.MAX_UPLOAD_SIZE
+        )
+    except PipelineError as e:
+        raise _http_error(e)
+    except FileNotFoundError:
+        raise _http_error(uploads.UploadError("Upload not found", 404))
+
+    async for _ in analyze_stream(analysis):
+        pass
+    try:
+        uploads.delete(upload_id)
+    except uploads.UploadError:
+        # Already removed by a concurrent analyze or the expiry sweep; the result still stands
+        pass
+
+    response = {
+        "verdict": analysis.verdict,
+        "score": analysis.score,
+        "explanation": analysis.explanation,
+    }
+    if analysis.signals:
+        response["signals"] = analysis.signals
+    return response
+
+
+@router.delete("/uploads/{upload_id}", status_code=204)
+def cancel_upload(upload_id: str):
+    try:
+        uploads.delete(upload_id)
+    except uploads.UploadError as e:
+        raise _http_error(e)
+    return Response(status_code=204)
@@ -0,0 +1,368 @@
+"""
+Scan local folders and tar archives of images and videos from the command line.
+
+Files are streamed through the same detection pipeline the API uses, spread
+over a pool of worker processes with a bounded number of files in flight
+(so memory stays flat however large the archive). Each result is appended
+to the output file as soon as it is ready (JSONL, or CSV if the output ends
+in .csv). Files already in the output are skipped, so an interrupted scan
+picks up where it stopped when rerun with the same output.
+
+Examples:
+    python scan.py /data/photos -o results.jsonl
+    python scan.py /data/archive.tar.gz /data/videos -o results.csv --workers 8
+    python scan.py /data/photos -o results.jsonl --retry-errors
+"""
+import argparse
+import asyncio
+import csv
+import json
+import multiprocessing
+import os
+import shutil
+import signal
+import sys
+import tarfile
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import config
+
+FIELDS = [
+    "source", "filename", "sha256", "file_type", "backend", "verdict", "score",
+    "raw_score", "frames", "cached", "error", "elapsed_ms", "scanned_at",
+]
+
+ARCHIVE_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+# Archive members are named "<archive>::<member path>" in the results
+ARCHIVE_SEPARATOR = "::"
+
+# Archive members larger than this are written to a temp file and passed to
+# the workers by path, so files in flight never hold more than a few of
+# these sizes in memory (members can be up to MAX_UPLOAD_SIZE)
+SPILL_BYTES = 8 * 1024 * 1024
+
+
+# ---------------------------------------------------------------- inputs
+
+
+def _supported(name: str) -> bool:
+    from services.pipeline import get_extension
+
+    return get_extension(name) in config.ALLOWED_EXTENSIONS
+
+
+def _size_limit(name: str) -> int:
+    from services.pipeline import get_extension
+
+    return config.MAX_UPLOAD_SIZE if get_extension(name) in config.VIDEO_EXTENSIONS else config.MAX_FILE_SIZE
+
+
+def iter_items(paths: list, done: set, spill_dir: str):
+    """
+    Lazily yield (source, filename, path, contents) for every supported file
+    not in `done`. Files on disk are passed by path (workers read them);
+    archive members are read here, one at a time, as the archive streams by
+    (large ones are written to a temp file in spill_dir and passed by path).
+    An archive that cannot be read is yielded as a finished error row (a dict).
+    """
+    for root in paths:
+        root = os.path.abspath(root)
+        if os.path.isfile(root) and root.lower().endswith(ARCHIVE_SUFFIXES):
+            yield from _iter_archive(root, done, spill_dir)
+        elif os.path.isfile(root):
+            if _supported(root) and root not in done:
+                yield root, os.path.basename(root), root, None
+        else:
+            for folder, dirs, names in os.walk(root):
+                dirs.sort()
+                for name in sorted(names):
+                    path = os.path.join(folder, name)
+                    if path.lower().endswith(ARCHIVE_SUFFIXES):
+                        yield from _iter_archive(path, done, spill_dir)
+                    elif _supported(name) and path not in done:
+                        yield path, name, path, None
+
+
+def _iter_archive(archive: str, done: set, spill_dir: str):
+    if archive in done:
+        # Recorded as unreadable by an earlier run
+        return
+    try:
+        # "r|*" reads the archive as a stream: no index of members is built up front
+        with tarfile.open(archive, "r|*") as tar:
+            for member in tar:
+                if not member.isfile() or not _supported(member.name):
+                    continue
+                source = f"{archive}{ARCHIVE_SEPARATOR}{member.name}"
+                if source in done:
+                    continue
+                filename = os.path.basename(member.name)
+                if member.size > _size_limit(member.name):
+                    # Left to the worker to reject, without reading the member
+                    yield source, filename, "", b""
+                elif member.size > SPILL_BYTES:
+                    yield source, filename, _spill(tar.extractfile(member), filename, spill_dir), None
+                else:
+                    yield source, filename, "", tar.extractfile(member).read()
+    except (tarfile.TarError, OSError) as e:
+        # A truncated or corrupt archive ends here; the rest of the scan goes on
+        yield {
+            "source": archive,
+            "filename": os.path.basename(archive),
+            "backend": "",
+            "error": f"Unreadable archive: {type(e).__name__}: {e}",
+            "elapsed_ms": 0.0,
+            "scanned_at": round(time.time(), 3),
+        }
+
+
+def _spill(stream, filename: str, spill_dir: str) -> str:
+    """Copy an archive member to a temp file (keeping its extension) and return the path."""
+    fd, path = tempfile.mkstemp(suffix=os.path.splitext(filename)[1], dir=spill_dir)
+    with os.fdopen(fd, "wb") as f:
+        shutil.copyfileobj(stream, f, 1024 * 1024)
+    return path
+
+
+# ---------------------------------------------------------------- workers
+
+_loop = None
+_backend = None
+_explain = False
+
+
+def _init_worker(backend: str, store_path: str, explain_result: bool):
+    """Runs once in every worker process."""
+    global _loop, _backend, _explain
+    # Ctrl+C is handled by the parent, which stops handing out files
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    config.STORE_PATH = store_path
+    _backend = backend
+    _explain = explain_result
+    # One event loop per worker, so pooled HTTP clients are reused across files
+    _loop = asyncio.new_event_loop()
+
+
+def scan_one(item: tuple) -> dict:
+    """Analyze one file in a worker process and return its result row."""
+    from services.pipeline import PipelineError, analyze_stream, prepare
+
+    source, filename, path, contents = item
+    start = time.perf_counter()
+    row = {"source": source, "filename": filename, "backend": _backend or config.DETECTOR_BACKEND}
+
+    async def analyze():
+        result = {}
+        async for event in analyze_stream(analysis, _backend, explain_result=_explain):
+            if event["event"] == "result":
+                result = event
+        return result
+
+    try:
+        if path:
+            analysis = prepare(filename, path=path, max_size=config.MAX_UPLOAD_SIZE)
+        else:
+            if not contents:
+                raise PipelineError("File too large or empty")
+            analysis = prepare(filename, contents, max_size=config.MAX_UPLOAD_SIZE)
+        result = _loop.run_until_complete(analyze())
+        row.update({
+            "sha256": analysis.sha256,
+            "file_type": analysis.file_type,
+            "backend": analysis.backend,
+            "verdict": analysis.verdict,
+            "score": analysis.score,
+            "raw_score": analysis.raw_score,
+            "frames": len(analysis.frame_scores),
+            "cached": bool(result.get("cached")),
+            "error": "; ".join(analysis.errors) if not analysis.frame_scores and not result.get("cached") else "",
+        })
+        if _explain:
+            row["explanation"] = analysis.explanation
+    except PipelineError as e:
+        row["error"] = e.message
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+
+    row["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    row["scanned_at"] = round(time.time(), 3)
+    return row
+
+
+# ---------------------------------------------------------------- results
+
+
+def load_checkpoint(output: str, retry_errors: bool) -> set:
+    """Sources already in the output file (only successful ones with retry_errors)."""
+    done = set()
+    if not os.path.exists(output):
+        return done
+    with open(output, newline="") as f:
+        if output.endswith(".csv"):
+            rows = csv.DictReader(f)
+        else:
+            rows = _read_jsonl(f)
+        for row in rows:
+            # A row cut short by a crash has missing fields; scan that file again
+            if not row or row.get("scanned_at") in (None, ""):
+                continue
+            if retry_errors and row.get("error"):
+                continue
+            done.add(row["source"])
+    return done
+
+
+def _read_jsonl(f):
+    for line in f:
+        try:
+            yield json.loads(line)
+        except ValueError:
+            continue
+
+
+class ResultWriter:
+    """Appends result rows to a JSONL or CSV file, flushing every row."""
+
+    def __init__(self, output: str, explain_result: bool = False):
+        self.csv = output.endswith(".csv")
+        self.fields = FIELDS + (["explanation"] if explain_result else [])
+        is_new = not os.path.exists(output) or os.path.getsize(output) == 0
+        if not is_new:
+            # Start on a fresh line if the last run was cut off mid-row
+            with open(output, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                cut_off = f.read(1) != b"\n"
+        self.file = open(output, "a", newline="")
+        if not is_new and cut_off:
+            self.file.write("\n")
+        if self.csv:
+            self.writer = csv.DictWriter(self.file, self.fields, extrasaction="ignore")
+            if is_new:
+                self.writer.writeheader()
+
+    def write(self, row: dict):
+        if self.csv:
+            self.writer.writerow(row)
+        else:
+            self.file.write(json.dumps(row) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class Progress:
+    """One status line: files done, failures, files/s and verdict counts."""
+
+    def __init__(self, skipped: int, interval: float = 0.5):
+        self.start = time.perf_counter()
+        self.skipped = skipped
+        self.interval = interval
+        self.last = 0.0
+        self.done = 0
+        self.failed = 0
+        self.verdicts = {}
+        self.tty = sys.stderr.isatty()
+
+    def update(self, row: dict):
+        self.done += 1
+        if row.get("error"):
+            self.failed += 1
+        else:
+            self.verdicts[row["verdict"]] = self.verdicts.get(row["verdict"], 0) + 1
+        now = time.perf_counter()
+        if now - self.last >= (self.interval if self.tty else 10 * self.interval):
+            self.last = now
+            self.show()
+
+    def line(self) -> str:
+        elapsed = time.perf_counter() - self.start
+        verdicts = " ".join(f"{k} {v}" for k, v in sorted(self.verdicts.items()))
+        return (f"[Scan] {self.done} done, {self.failed} failed, {self.skipped} skipped | "
+                f"{self.done / max(elapsed, 1e-9):.2f} files/s | {verdicts}")
+
+    def show(self, final: bool = False):
+        if self.tty:
+            end = "\n" if final else ""
+            sys.stderr.write("\r" + self.line() + "\033[K" + end)
+        else:
+            sys.stderr.write(self.line() + "\n")
+        sys.stderr.flush()
+
+
+# ---------------------------------------------------------------- main
+
+
+def run(args) -> int:
+    done = load_checkpoint(args.output, args.retry_errors)
+    if done:
+        print(f"[Scan] Resuming: {len(done)} files already in {args.output}")
+
+    writer = ResultWriter(args.output, args.explain)
+    progress = Progress(skipped=len(done))
+    spill_dir = tempfile.mkdtemp(prefix="deepguard-scan-")
+    # future -> temp file to delete once it is scanned ("" for none)
+    in_flight = {}
+    max_in_flight = max(1, args.workers * args.queue_per_worker)
+    store_path = "" if args.no_store else config.STORE_PATH
+
+    # Spawned (not forked) workers: a forked child can inherit locks held by
+    # the parent's threads and hang, as with the video decoder process
+    executor = ProcessPoolExecutor(
+        max_workers=args.workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(args.backend, store_path, args.explain),
+    )
+    try:
+        for item in iter_items(args.paths, done, spill_dir):
+            if isinstance(item, dict):
+                _finish(item, writer, progress)
+                continue
+            # Bounded: never read ahead more than max_in_flight files
+            while len(in_flight) >= max_in_flight:
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    _finish(future.result(), writer, progress, in_flight.pop(future))
+            spilled = item[2] if item[2].startswith(spill_dir) else ""
+            in_flight[executor.submit(scan_one, item)] = spilled
+
+        for future in wait(in_flight).done:
+            _finish(future.result(), writer, progress, in_flight.pop(future))
+    except KeyboardInterrupt:
+        print("\n[Scan] Interrupted; finished results are saved, rerun to resume.", file=sys.stderr)
+        return 130
+    finally:
+        executor.shutdown(wait=not in_flight, cancel_futures=True)
+        shutil.rmtree(spill_dir, ignore_errors=True)
+        writer.close()
+        progress.show(final=True)
+    return 1 if progress.done and progress.failed == progress.done else 0
+
+
+def _finish(row: dict, writer: ResultWriter, progress: Progress, spilled: str = ""):
+    writer.write(row)
+    progress.update(row)
+    if spilled:
+        os.remove(spilled)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scan folders and tar archives for deepfakes.")
+    parser.add_argument("paths", nargs="+", help="Folders, files or tar archives (.tar, .tar.gz, ...)")
+    parser.add_argument("-o", "--output", default="scan_results.jsonl", help="Results file (.jsonl or .csv)")
+    parser.add_argument("--backend", default=config.DETECTOR_BACKEND, help="Detector backend")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1), help="Worker processes")
+    parser.add_argument("--queue-per-worker", type=int, default=2, help="Files in flight per worker")
+    parser.add_argument("--retry-errors", action="store_true", help="Rescan files whose earlier result was an error")
+    parser.add_argument("--explain", action="store_true", help="Also ask Gemini for an explanation per file")
+    parser.add_argument("--no-store", action="store_true", help="Do not read or write the verdict store")
+    args = parser.parse_args(argv)
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
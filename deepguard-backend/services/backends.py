@@ -0,0 +1,93 @@
+import asyncio
+import os
+
+import config
+
+
+class HuggingFaceBackend:
+    """
+    Scores images with the HuggingFace Inference API (see detector.py).
+    The client builds its own requests, so the profile's gzip is ignored.
+    """
+
+    name = "huggingface"
+
+    @property
+    def model_version(self) -> str:
+        from detector import MODEL_NAME
+
+        return MODEL_NAME
+
+    async def score(self, image_bytes: bytes, filename: str) -> dict:
+        from detector import classify_image
+
+        # The HF client is synchronous, so keep it off the event loop
+        result = await asyncio.to_thread(classify_image, image_bytes)
+        if "error" in result:
+            return {"score": 0.5, "error": result["error"]}
+        return {"score": result["score"], "raw": result}
+
+
+class RenderBackend:
+    """Scores images with the deployed Render model API (see services/detector.py)."""
+
+    name = "render"
+
+    @property
+    def model_version(self) -> str:
+        return config.MODEL_VERSION or os.getenv("MODEL_API_URL", "")
+
+    async def score(self, image_bytes: bytes, filename: str) -> dict:
+        from services import detector as render_api
+        from services.transfer import get_profile
+
+        # Payloads arrive already encoded as the profile asks (see pipeline)
+        profile = get_profile(self.name)
+        extension = "webp" if profile.format == "webp" else "jpg"
+        name = f"{os.path.splitext(filename)[0] or 'image'}.{extension}"
+        result = await render_api.detect_deepfake(image_bytes, name, profile.content_type, profile.gzip)
+        if not result["success"]:
+            return {"score": 0.5, "error": result["error"]}
+        raw = result["result"]
+        return {"score": render_api.result_to_fake_score(raw), "raw": raw}
+
+
+class LocalBackend:
+    """Scores images in-process with weights shared across workers (see services/local_model.py)."""
+
+    name = "local"
+    # Video frames can be passed as RGB arrays, skipping a JPEG encode/decode
+    accepts_arrays = True
+
+    @property
+    def model_version(self) -> str:
+        return config.LOCAL_MODEL_NAME
+
+    async def score(self, image_bytes, filename: str) -> dict:
+        from detector import parse_fake_score
+        from services import local_model
+
+        try:
+            predictions = await asyncio.to_thread(local_model.classify_image, image_bytes)
+        except Exception as e:
+            return {"score": 0.5, "error": f"Local model failed: {e}"}
+        return {"score": parse_fake_score(predictions), "raw": predictions}
+
+
+BACKENDS = {
+    HuggingFaceBackend.name: HuggingFaceBackend,
+    RenderBackend.name: RenderBackend,
+    LocalBackend.name: LocalBackend,
+}
+
+_instances = {}
+
+
+def get_backend(name: str = None):
+    """Return the (shared) backend instance for `name`, or the configured default."""
+    name = (name or config.DETECTOR_BACKEND).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown detector backend '{name}'. Choose from: {', '.join(BACKENDS)}")
+    if name not in _instances:
+        _instances[name] = BACKENDS[name]()
+    return _instances[name]
@@ -0,0 +1,193 @@
+"""
+Score calibration and verdict thresholds.
+
+Each backend's raw fake score can be mapped through a fitted calibrator
+(Platt scaling or isotonic regression) so that, e.g., 0.7 means roughly
+"70% of files scored like this are fake" for every backend. Calibrators are
+fitted offline with evaluate.py and stored as JSON at CALIBRATION_PATH:
+
+    {"huggingface": {"method": "platt", "a": -6.1, "b": 3.2},
+     "render": {"method": "isotonic", "x": [...], "y": [...]}}
+
+The FAKE/REAL thresholds come from config (FAKE_THRESHOLD / REAL_THRESHOLD).
+"""
+import json
+import os
+from threading import Lock
+
+import numpy as np
+
+import config
+
+_calibrators = None
+_lock = Lock()
+
+
+# ---------------------------------------------------------------- calibrators
+
+
+class PlattCalibrator:
+    """p = 1 / (1 + exp(a * score + b)), fitted by logistic regression."""
+
+    method = "platt"
+
+    def __init__(self, a: float, b: float):
+        self.a = a
+        self.b = b
+
+    def apply(self, scores):
+        scores = np.asarray(scores, dtype=np.float64)
+        return 1.0 / (1.0 + np.exp(self.a * scores + self.b))
+
+    def to_dict(self) -> dict:
+        return {"method": self.method, "a": self.a, "b": self.b}
+
+
+class IsotonicCalibrator:
+    """Monotonic step function fitted with pool-adjacent-violators, interpolated linearly."""
+
+    method = "isotonic"
+
+    def __init__(self, x, y):
+        self.x = [float(v) for v in x]
+        self.y = [float(v) for v in y]
+
+    def apply(self, scores):
+        return np.interp(np.asarray(scores, dtype=np.float64), self.x, self.y)
+
+    def to_dict(self) -> dict:
+        return {"method": self.method, "x": self.x, "y": self.y}
+
+
+def fit_platt(scores, labels, iterations: int = 100) -> PlattCalibrator:
+    """
+    Fit Platt scaling with Newton's method, using Platt's smoothed targets
+    so the fit stays finite on perfectly separable data.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    labels = np.asarray(labels, dtype=np.float64)
+    positives = labels.sum()
+    negatives = len(labels) - positives
+    targets = np.where(labels > 0, (positives + 1) / (positives + 2), 1 / (negatives + 2))
+
+    a, b = 0.0, float(np.log((negatives + 1) / (positives + 1)))
+    for _ in range(iterations):
+        p = 1.0 / (1.0 + np.exp(a * scores + b))
+        # Gradient and Hessian of the log loss with respect to (a, b)
+        d = targets - p
+        w = p * (1 - p)
+        grad = np.array([(d * scores).sum(), d.sum()])
+        hess = np.array([
+            [(w * scores * scores).sum(), (w * scores).sum()],
+            [(w * scores).sum(), w.sum()],
+        ]) + np.eye(2) * 1e-9
+        step = np.linalg.solve(hess, grad)
+        a, b = a - step[0], b - step[1]
+        if np.abs(step).max() < 1e-8:
+            break
+    return PlattCalibrator(float(a), float(b))
+
+
+def fit_isotonic(scores, labels) -> IsotonicCalibrator:
+    """Fit a non-decreasing map from score to fake rate (pool adjacent violators)."""
+    # Equal scores start as one block, so the fit does not depend on input order
+    x, which = np.unique(np.asarray(scores, dtype=np.float64), return_inverse=True)
+    totals = np.bincount(which, weights=np.asarray(labels, dtype=np.float64), minlength=len(x))
+    counts = np.bincount(which, minlength=len(x)).astype(np.float64)
+
+    # Each block: [sum of labels, count, min x, max x]
+    blocks = []
+    for xi, total, count in zip(x, totals, counts):
+        blocks.append([total, count, xi, xi])
+        while len(blocks) > 1 and blocks[-2][0] / blocks[-2][1] > blocks[-1][0] / blocks[-1][1]:
+            total, count, _, high = blocks.pop()
+            blocks[-1][0] += total
+            blocks[-1][1] += count
+            blocks[-1][3] = high
+
+    xs, ys = [], []
+    for total, count, low, high in blocks:
+        # One point per distinct score, so np.interp never sees a repeated x
+        points = [low] if low == high else [low, high]
+        xs.extend(points)
+        ys.extend([total / count] * len(points))
+    return IsotonicCalibrator(xs, ys)
+
+
+FITTERS = {"platt": fit_platt, "isotonic": fit_isotonic}
+
+
+def from_dict(data: dict):
+    if data.get("method") == "platt":
+        return PlattCalibrator(data["a"], data["b"])
+    if data.get("method") == "isotonic":
+        return IsotonicCalibrator(data["x"], data["y"])
+    raise ValueError(f"Unknown calibration method: {data.get('method')}")
+
+
+# ---------------------------------------------------------------- storage
+
+
+def load() -> dict:
+    """Read calibrators from CALIBRATION_PATH (empty if there is no file)."""
+    path = config.CALIBRATION_PATH
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        data = json.load(f)
+    return {backend: from_dict(entry) for backend, entry in data.items()}
+
+
+def save(backend: str, calibrator, path: str = None):
+    """Write (or replace) one backend's calibrator in the calibration file."""
+    path = path or config.CALIBRATION_PATH
+    data = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            data = json.load(f)
+    data[backend] = calibrator.to_dict()
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+    reload()
+
+
+def reload():
+    """Forget loaded calibrators so the file is read again on next use."""
+    global _calibrators
+    with _lock:
+        _calibrators = None
+
+
+def get_calibrator(backend: str):
+    global _calibrators
+    if _calibrators is None:
+        with _lock:
+            if _calibrators is None:
+                try:
+                    _calibrators = load()
+                except Exception as e:
+                    print(f"[Calibration] Could not load {config.CALIBRATION_PATH}: {e}")
+                    _calibrators = {}
+    return _calibrators.get(backend)
+
+
+# ---------------------------------------------------------------- scoring
+
+
+def calibrate(score: float, backend: str) -> float:
+    """Map a backend's raw fake score through its calibrator (if it has one)."""
+    calibrator = get_calibrator(backend)
+    if calibrator is None:
+        return score
+    return round(float(calibrator.apply([score])[0]), 4)
+
+
+def score_to_verdict(score: float, fake_threshold: float = None, real_threshold: float = None) -> str:
+    """FAKE above the fake threshold, REAL below the real one, else SUSPICIOUS."""
+    fake_threshold = config.FAKE_THRESHOLD if fake_threshold is None else fake_threshold
+    real_threshold = config.REAL_THRESHOLD if real_threshold is None else real_threshold
+    if score > fake_threshold:
+        return "FAKE"
+    if score < real_threshold:
+        return "REAL"
+    return "SUSPICIOUS"
@@ -1,13 +1,47 @@
+import gzip
 import os
 import httpx
 
 MODEL_API_URL = os.getenv("MODEL_API_URL", "")
 
+# One pooled client per worker so connections to the model API are reused
+_client = None
 
-async def detect_deepfake(image_bytes: bytes, filename: str) -> dict:
+
+def get_client() -> httpx.AsyncClient:
+    """Return the shared AsyncClient, creating it on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=60.0,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        )
+    return _client
+
+
+async def close_client():
+    """Close the shared AsyncClient (called on app shutdown)."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def _post_gzipped(client: httpx.AsyncClient, files: dict) -> httpx.Response:
+    """POST a multipart form with a gzip-compressed body (Content-Encoding: gzip)."""
+    request = client.build_request("POST", MODEL_API_URL, files=files)
+    body = gzip.compress(request.read(), compresslevel=6)
+    headers = {"Content-Type": request.headers["Content-Type"], "Content-Encoding": "gzip"}
+    return await client.post(MODEL_API_URL, content=body, headers=headers)
+
+
+async def detect_deepfake(image_bytes: bytes, filename: str, content_type: str = "image/jpeg",
+                          gzip_body: bool = False) -> dict:
     """
     Send image bytes to the deployed Render model API and return the prediction.
     Returns a dict with 'label' (real/fake) and 'confidence' score.
+    With gzip_body=True the request body is gzipped; the API (or a proxy in
+    front of it) must accept Content-Encoding: gzip.
     """
     if not MODEL_API_URL:
         return {
@@ -16,11 +50,13 @@ async def detect_deepfake(image_bytes: bytes, filename: str) -> dict:
         }
 
     try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            files = {"file": (filename, image_bytes, "image/jpeg")}
-            response = await client.post(MODEL_API_URL, files=files)
-            response.raise_for_status()
-            result = response.json()
+        files = {"file": (filename, image_bytes, content_type)}
+        if gzip_body:
+            response = await _post_gzipped(get_client(), files)
+        else:
+            response = await get_client().post(MODEL_API_URL, files=files)
+        response.raise_for_status()
+        result = response.json()
 
         return {
             "success": True,
@@ -42,3 +78,20 @@ async def detect_deepfake(image_bytes: bytes, filename: str) -> dict:
             "success": False,
             "error": f"Failed to connect to model API: {str(e)}",
         }
+
+
+def result_to_fake_score(result: dict) -> float:
+    """
+    Convert the model API's {'label', 'confidence'} answer into a fake
+    probability between 0 and 1.
+    """
+    label = str(result.get("label", "")).lower()
+    confidence = float(result.get("confidence", 0.5))
+    if confidence > 1.0:
+        # Some deployments report a percentage
+        confidence = confidence / 100.0
+    if "fake" in label or "artificial" in label:
+        return round(confidence, 4)
+    if "real" in label or "human" in label:
+        return round(1.0 - confidence, 4)
+    return 0.5
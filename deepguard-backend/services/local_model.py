@@ -0,0 +1,55 @@
+"""
+In-process inference with the HuggingFace image detector.
+
+The weights are loaded once per process tree: under gunicorn with
+preload_app (see gunicorn.conf.py) the master loads them before forking
+and freezes the GC. Workers only read the weights (under inference_mode),
+so fork's copy-on-write keeps them on the same physical pages instead of
+each worker holding its own copy.
+"""
+from io import BytesIO
+from threading import Lock
+
+import config
+
+_pipeline = None
+_lock = Lock()
+
+
+def load_model():
+    """Load the model once. Safe to call from every worker and thread."""
+    global _pipeline
+    if _pipeline is not None:
+        return _pipeline
+
+    with _lock:
+        if _pipeline is None:
+            import torch
+            from transformers import pipeline
+
+            torch.set_num_threads(max(1, config.LOCAL_TORCH_THREADS))
+            print(f"[LocalModel] Loading {config.LOCAL_MODEL_NAME}...")
+            classifier = pipeline("image-classification", model=config.LOCAL_MODEL_NAME, device=-1)
+            classifier.model.eval()
+            for param in classifier.model.parameters():
+                param.requires_grad_(False)
+            _pipeline = classifier
+            print("[LocalModel] Model ready")
+    return _pipeline
+
+
+def classify_image(image) -> list:
+    """
+    Run the local model on JPEG/PNG bytes or an RGB numpy array
+    and return [{label, score}, ...].
+    """
+    import torch
+    from PIL import Image
+
+    classifier = load_model()
+    if isinstance(image, (bytes, bytearray)):
+        image = Image.open(BytesIO(image)).convert("RGB")
+    else:
+        image = Image.fromarray(image)
+    with torch.inference_mode():
+        return classifier(image)
@@ -0,0 +1,53 @@
+import time
+from contextlib import contextmanager
+from threading import Lock
+
+# stage name -> {"count", "total_ms", "max_ms"}
+_stages = {}
+_counters = {}
+_lock = Lock()
+
+
+def record(stage: str, elapsed_ms: float):
+    """Add one timing sample for a pipeline stage."""
+    with _lock:
+        entry = _stages.setdefault(stage, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+        entry["count"] += 1
+        entry["total_ms"] += elapsed_ms
+        entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+
+
+def increment(name: str, amount: int = 1):
+    """Bump a named counter (requests, cache hits, errors, ...)."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+@contextmanager
+def timed(stage: str, timings: dict = None):
+    """
+    Time a block of code and record it under `stage`.
+    If a `timings` dict is given, the elapsed milliseconds are stored there too.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        record(stage, elapsed_ms)
+        if timings is not None:
+            timings[stage] = round(timings.get(stage, 0.0) + elapsed_ms, 2)
+
+
+def snapshot() -> dict:
+    """Return a copy of all stage timings and counters."""
+    with _lock:
+        stages = {
+            name: {
+                "count": entry["count"],
+                "avg_ms": round(entry["total_ms"] / entry["count"], 2) if entry["count"] else 0.0,
+                "max_ms": round(entry["max_ms"], 2),
+            }
+            for name, entry in _stages.items()
+        }
+        return {"stages": stages, "counters": dict(_counters)}
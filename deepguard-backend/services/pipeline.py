@@ -0,0 +1,540 @@
+"""
+Single analysis pipeline shared by /analyze and /detect.
+
+Every upload goes through the same stages:
+    ingest -> validate -> preprocess -> score -> explain
+
+The scoring backend (HuggingFace, the Render model API or a local model)
+is pluggable, and the score cache, connection pool and metrics are shared
+by all routes.
+"""
+import asyncio
+import hashlib
+import os
+import tempfile
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import config
+from services import metrics
+from services.backends import get_backend
+from services.cache import LRUCache
+from services.transfer import get_profile
+
+# Backend scores keyed by "<backend>:<sha256 of the payload>"
+score_cache = LRUCache(config.SCORE_CACHE_SIZE)
+
+# Limits how many backend calls one worker makes at the same time
+_backend_slots = None
+
+# Decoding runs on its own threads (see _get_decode_executor)
+_decode_executor = None
+
+FALLBACK_EXPLANATION = "Analysis complete. Manual review recommended."
+
+# Marks the end of the decoded payloads on the frame queue
+_DONE = object()
+
+
+class _Stopped(Exception):
+    """Raised inside the decoder thread when the consumer has gone away."""
+
+
+class PipelineError(Exception):
+    """Raised when an upload is rejected. Routes turn this into an HTTP error."""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+@dataclass
+class Analysis:
+    """Everything the pipeline knows about one upload, filled in stage by stage."""
+
+    filename: str
+    contents: bytes
+    # Set instead of `contents` for large videos already on disk (chunked uploads)
+    path: str = ""
+    size: int = 0
+    ext: str = ""
+    file_type: str = "image"
+    sha256: str = ""
+    phash: str = ""
+    cached: bool = False
+    frame_scores: list = field(default_factory=list)
+    errors: list = field(default_factory=list)
+    raw: list = field(default_factory=list)
+    backend: str = ""
+    # raw_score: frame average (blended with the temporal score for videos)
+    # before calibration; score: after the backend's calibrator
+    raw_score: float = 0.5
+    score: float = 0.5
+    verdict: str = "SUSPICIOUS"
+    explanation: str = ""
+    # Extra video signals ("temporal", "audio") measured while decoding
+    signals: dict = field(default_factory=dict)
+    timings: dict = field(default_factory=dict)
+
+
+def _get_decode_executor() -> ThreadPoolExecutor:
+    """
+    Threads that decode uploads. Kept apart from the event loop's default
+    executor: a decoder waiting for the consumer to make room must never hold
+    a thread that backend calls (asyncio.to_thread) need to make progress.
+    """
+    global _decode_executor
+    if _decode_executor is None:
+        _decode_executor = ThreadPoolExecutor(
+            max_workers=min(32, (os.cpu_count() or 1) + 4), thread_name_prefix="decode"
+        )
+    return _decode_executor
+
+
+def _get_slots() -> asyncio.Semaphore:
+    global _backend_slots
+    if _backend_slots is None:
+        _backend_slots = asyncio.Semaphore(max(1, config.BACKEND_CONCURRENCY))
+    return _backend_slots
+
+
+def get_extension(filename: str) -> str:
+    """Return the lowercase extension of a filename ('' if there is none)."""
+    return filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+
+
+# ---------------------------------------------------------------- stages
+
+
+def ingest(analysis: Analysis):
+    """Work out the file type and content hash of the upload."""
+    analysis.ext = get_extension(analysis.filename)
+    analysis.file_type = "video" if analysis.ext in config.VIDEO_EXTENSIONS else "image"
+
+    if analysis.path:
+        # Hash large files in blocks instead of reading them into memory
+        digest = hashlib.sha256()
+        with open(analysis.path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        analysis.sha256 = digest.hexdigest()
+        analysis.size = os.path.getsize(analysis.path)
+    else:
+        analysis.sha256 = hashlib.sha256(analysis.contents).hexdigest()
+        analysis.size = len(analysis.contents)
+
+
+def validate(analysis: Analysis, allowed_extensions=None, max_size: int = None):
+    """
+    Reject uploads with the wrong extension, too many bytes, or a broken
+    image, or whose header declares more pixels than the budget allows.
+    """
+    from utils.image_processing import validate_image_bytes
+
+    allowed = allowed_extensions or config.ALLOWED_EXTENSIONS
+    if analysis.ext not in allowed:
+        raise PipelineError(f"Invalid file type. Allowed: {', '.join(sorted(allowed))}")
+
+    max_size = max_size or config.MAX_FILE_SIZE
+    if analysis.file_type == "image":
+        max_size = min(max_size, config.MAX_FILE_SIZE)
+    if analysis.size > max_size:
+        raise PipelineError(f"File too large. Maximum size is {max_size // (1024 * 1024)}MB")
+
+    if analysis.file_type == "image" and analysis.path:
+        with open(analysis.path, "rb") as f:
+            analysis.contents = f.read()
+
+    if analysis.file_type == "image":
+        check = validate_image_bytes(
+            analysis.contents,
+            config.MAX_FILE_SIZE,
+            max_pixels=config.MAX_IMAGE_PIXELS,
+            max_dimension=config.MAX_IMAGE_DIMENSION,
+            max_frames=config.MAX_IMAGE_FRAMES,
+        )
+        if not check["valid"]:
+            raise PipelineError(check["error"])
+
+
+def _produce_payloads(analysis: Analysis, as_arrays: bool, profile, deliver, room: threading.Semaphore,
+                      stop: threading.Event):
+    """
+    Runs in a decode thread: decode the upload and hand (index, payload)
+    items to `deliver` as soon as each one is ready, then _DONE. Each item
+    first takes a slot from `room` (the consumer gives it back), so at most
+    VIDEO_RING_SLOTS decoded payloads wait in memory. Stops early when the
+    consumer sets `stop` (e.g. a streaming client disconnected). Payloads
+    are sized and encoded as the backend's transfer profile asks.
+    """
+    from services import store
+    from services.transfer import encode_image
+
+    # The perceptual hash is only kept in the verdict store; skip the extra decode without one
+    want_phash = store.enabled() and not analysis.phash
+
+    def emit(index, payload):
+        if want_phash and not analysis.phash:
+            _set_phash(analysis, payload)
+        while not stop.is_set():
+            if room.acquire(timeout=0.5):
+                deliver((index, payload))
+                return
+        raise _Stopped()
+
+    try:
+        with metrics.timed("preprocess", analysis.timings):
+            if analysis.file_type == "video":
+                _produce_video_payloads(analysis, as_arrays, profile, emit)
+            else:
+                emit(0, encode_image(analysis.contents, profile))
+    except _Stopped:
+        pass
+    finally:
+        # Needs no slot, so the consumer always learns the stream has ended
+        deliver(_DONE)
+
+
+def _set_phash(analysis: Analysis, payload):
+    from utils.image_processing import dhash
+
+    # Images are hashed from the original upload, videos from their first frame
+    try:
+        analysis.phash = dhash(analysis.contents if analysis.file_type == "image" else payload)
+    except Exception:
+        analysis.phash = ""
+
+
+def _produce_video_payloads(analysis: Analysis, as_arrays: bool, profile, emit):
+    if analysis.path:
+        analysis.signals = _decode_video_file(analysis.path, as_arrays, profile, emit)
+        return
+
+    # OpenCV needs a real file, so use a unique temp file per request
+    fd, temp_path = tempfile.mkstemp(suffix=f".{analysis.ext}")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(analysis.contents)
+        analysis.signals = _decode_video_file(temp_path, as_arrays, profile, emit)
+    finally:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+
+
+def _decode_video_file(video_path: str, as_arrays: bool, profile, emit) -> dict:
+    """Emit the sampled frames and return the temporal/audio signals."""
+    from services.transfer import frame_options
+    from video_utils import for_each_frame_payload
+
+    signals = {}
+    signals["temporal"] = for_each_frame_payload(
+        video_path,
+        emit,
+        max_frames=config.VIDEO_SAMPLE_FRAMES,
+        max_side=config.MAX_IMAGE_SIDE,
+        as_arrays=as_arrays,
+        in_process=config.VIDEO_DECODER == "process",
+        slots=config.VIDEO_RING_SLOTS,
+        temporal=config.TEMPORAL_ANALYSIS,
+        **frame_options(profile),
+    )
+    if config.AUDIO_ANALYSIS:
+        from utils.temporal import audio_features
+
+        # Reads only the audio stream; no video frames are decoded again
+        signals["audio"] = audio_features(video_path)
+    return {name: value for name, value in signals.items() if value}
+
+
+async def score_payload(backend, payload, filename: str) -> dict:
+    """Score one payload, answering from the score cache when possible."""
+    key = f"{backend.name}:{hashlib.sha256(payload).hexdigest()}"
+    cached = score_cache.get(key)
+    if cached is not None:
+        metrics.increment("cache_hits")
+        return cached
+
+    metrics.increment("backend_calls")
+    async with _get_slots():
+        result = await backend.score(payload, filename)
+
+    # Never cache failures, so a retry can still succeed
+    if "error" not in result:
+        score_cache.put(key, result)
+    else:
+        metrics.increment("backend_errors")
+    return result
+
+
+async def _score_indexed(backend, index: int, payload, filename: str) -> tuple:
+    return index, await score_payload(backend, payload, filename)
+
+
+async def preprocess_and_score(analysis: Analysis, backend_name: str = None):
+    """
+    Decode the upload in a worker thread and score each payload as soon as it
+    is ready, yielding (index, result) in the order scores come back.
+
+    Payloads are JPEG/WebP bytes shaped by the backend's transfer profile
+    (see services/transfer.py), or raw RGB frames for backends that accept
+    arrays (no JPEG round trip). Decoding never runs on the event loop.
+    """
+    backend = get_backend(backend_name)
+    analysis.backend = backend.name
+    as_arrays = getattr(backend, "accepts_arrays", False)
+    profile = get_profile(backend.name)
+
+    # Decoded payloads reach the event loop through an asyncio.Queue, so no
+    # executor thread ever sits blocked waiting for the next frame
+    loop = asyncio.get_running_loop()
+    frames = asyncio.Queue()
+    room = threading.Semaphore(max(1, config.VIDEO_RING_SLOTS))
+    stop = threading.Event()
+
+    def deliver(item):
+        try:
+            loop.call_soon_threadsafe(frames.put_nowait, item)
+        except RuntimeError:
+            # The event loop has closed; nobody is listening any more
+            stop.set()
+
+    producer = loop.run_in_executor(
+        _get_decode_executor(), _produce_payloads, analysis, as_arrays, profile, deliver, room, stop
+    )
+    next_frame = asyncio.ensure_future(frames.get())
+    pending = set()
+
+    try:
+        while next_frame is not None or pending:
+            waiting = pending | ({next_frame} if next_frame is not None else set())
+            done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task is next_frame:
+                    item = task.result()
+                    if item is _DONE:
+                        next_frame = None
+                        continue
+                    room.release()
+                    index, payload = item
+                    pending.add(asyncio.ensure_future(
+                        _score_indexed(backend, index, payload, analysis.filename)
+                    ))
+                    next_frame = asyncio.ensure_future(frames.get())
+                else:
+                    pending.discard(task)
+                    yield task.result()
+
+        # Surface decode errors (the producer has finished by now)
+        await producer
+    finally:
+        stop.set()
+        if next_frame is not None:
+            next_frame.cancel()
+        for task in pending:
+            task.cancel()
+
+
+def add_result(analysis: Analysis, result: dict):
+    """Fold one frame's backend result into the running score and verdict."""
+    if "error" in result:
+        analysis.errors.append(result["error"])
+        return
+    analysis.frame_scores.append(result["score"])
+    analysis.raw.append(result.get("raw"))
+    update_score(analysis)
+
+
+def update_score(analysis: Analysis, temporal: dict = None):
+    """
+    Recompute score and verdict from the frame scores so far: average them,
+    blend in the temporal score if given, then apply the backend's calibrator.
+    """
+    from services.calibration import calibrate, score_to_verdict
+    from utils.temporal import combine_scores
+
+    raw_score = round(sum(analysis.frame_scores) / len(analysis.frame_scores), 4)
+    if temporal:
+        raw_score = combine_scores(raw_score, temporal, config.TEMPORAL_WEIGHT)
+    analysis.raw_score = raw_score
+    analysis.score = calibrate(raw_score, analysis.backend)
+    analysis.verdict = score_to_verdict(analysis.score)
+
+
+async def explain(analysis: Analysis):
+    """Ask the explainer for a plain-English summary of the verdict."""
+    from explainer import generate_explanation
+
+    try:
+        analysis.explanation = await asyncio.to_thread(
+            generate_explanation, analysis.score, analysis.verdict, analysis.file_type
+        )
+    except Exception:
+        analysis.explanation = FALLBACK_EXPLANATION
+
+
+# ---------------------------------------------------------------- engine
+
+
+def prepare(filename: str, contents: bytes = b"", allowed_extensions=None,
+            path: str = "", max_size: int = None) -> Analysis:
+    """
+    Run the ingest and validate stages on in-memory `contents`, or on a
+    file at `path` (large uploads that were assembled on disk).
+    Raises PipelineError if the upload is rejected.
+    """
+    analysis = Analysis(filename=filename or "", contents=contents, path=path)
+    metrics.increment("requests")
+
+    with metrics.timed("ingest", analysis.timings):
+        ingest(analysis)
+    with metrics.timed("validate", analysis.timings):
+        validate(analysis, allowed_extensions, max_size)
+    return analysis
+
+
+async def analyze_stream(analysis: Analysis, backend_name: str = None, explain_result: bool = True):
+    """
+    Run the remaining stages on a prepared Analysis, yielding an event dict
+    after every scored frame and a final "result" event. Stopping iteration
+    early (e.g. the client went away) stops decoding and pending backend calls.
+    """
+    yield {"event": "start", "file_type": analysis.file_type}
+
+    backend = get_backend(backend_name)
+    if await _load_stored(analysis, backend):
+        if explain_result and not analysis.explanation:
+            with metrics.timed("explain", analysis.timings):
+                await explain(analysis)
+        yield _result_event(analysis)
+        return
+
+    try:
+        with metrics.timed("score", analysis.timings):
+            async for index, result in preprocess_and_score(analysis, backend_name):
+                add_result(analysis, result)
+                yield {
+                    "event": "frame",
+                    "index": index,
+                    "frame_score": result.get("score"),
+                    "score": analysis.score,
+                    "verdict": analysis.verdict,
+                    "frames_scored": len(analysis.frame_scores),
+                    "error": result.get("error"),
+                }
+    except Exception as e:
+        # Fallback if anything fails during detection
+        traceback.print_exc()
+        metrics.increment("pipeline_errors")
+        analysis.errors.append(str(e))
+        analysis.frame_scores.clear()
+
+    if not analysis.frame_scores:
+        analysis.score = 0.5
+        analysis.verdict = "SUSPICIOUS"
+    elif analysis.signals.get("temporal"):
+        update_score(analysis, analysis.signals["temporal"])
+
+    if explain_result:
+        with metrics.timed("explain", analysis.timings):
+            await explain(analysis)
+
+    # A verdict with failed frames is only partial; store (and later reuse) complete ones only
+    if analysis.frame_scores and not analysis.errors:
+        await _save(analysis, backend)
+
+    yield _result_event(analysis)
+
+
+def _result_event(analysis: Analysis) -> dict:
+    return {
+        "event": "result",
+        "verdict": analysis.verdict,
+        "score": analysis.score,
+        "explanation": analysis.explanation,
+        "frames_scored": len(analysis.frame_scores),
+        "signals": analysis.signals,
+        "cached": analysis.cached,
+    }
+
+
+async def _load_stored(analysis: Analysis, backend) -> bool:
+    """Fill the Analysis from a stored verdict for the same file, if there is one."""
+    from services import store
+
+    if not (store.enabled() and config.STORE_REUSE_RESULTS):
+        return False
+    try:
+        stored = await asyncio.to_thread(
+            store.find_latest, analysis.sha256, backend.name, backend.model_version
+        )
+    except Exception:
+        traceback.print_exc()
+        return False
+    if stored is None:
+        return False
+
+    metrics.increment("store_hits")
+    analysis.backend = backend.name
+    analysis.cached = True
+    analysis.phash = stored["phash"] or ""
+    if stored.get("raw_score") is not None:
+        # Calibrate again, so a refitted calibrator or new thresholds apply to old rows
+        from services.calibration import calibrate, score_to_verdict
+
+        analysis.raw_score = stored["raw_score"]
+        analysis.score = calibrate(analysis.raw_score, backend.name)
+        analysis.verdict = score_to_verdict(analysis.score)
+    else:
+        # Stored before raw scores were kept; only the calibrated score is known
+        analysis.raw_score = stored["score"]
+        analysis.score = stored["score"]
+        analysis.verdict = stored["verdict"]
+    analysis.frame_scores = [analysis.raw_score] * max(1, stored["frames"] or 1)
+    # An explanation written for a different verdict is dropped and written again
+    if analysis.verdict == stored["verdict"]:
+        analysis.explanation = stored["explanation"] or ""
+    return True
+
+
+async def _save(analysis: Analysis, backend):
+    """Record the verdict; a store failure never fails the request."""
+    from services import store
+
+    if not store.enabled():
+        return
+    try:
+        await asyncio.to_thread(store.record, analysis, backend.model_version)
+    except Exception:
+        traceback.print_exc()
+        metrics.increment("store_errors")
+
+
+async def run_pipeline(
+    filename: str,
+    contents: bytes,
+    allowed_extensions=None,
+    backend_name: str = None,
+    explain_result: bool = True,
+) -> Analysis:
+    """
+    Run an upload through every stage and return the filled-in Analysis.
+    Raises PipelineError if the upload is rejected during validation.
+    """
+    # Hashing and validating (Pillow verify) a large upload would block the event loop
+    analysis = await asyncio.to_thread(prepare, filename, contents, allowed_extensions)
+    async for _ in analyze_stream(analysis, backend_name, explain_result):
+        pass
+    return analysis
+
+
+def stats() -> dict:
+    """Metrics plus cache statistics, for the /metrics endpoint."""
+    data = metrics.snapshot()
+    data["score_cache"] = score_cache.stats()
+    data["backend"] = config.DETECTOR_BACKEND
+    return data
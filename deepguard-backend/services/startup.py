@@ -0,0 +1,106 @@
+"""
+Startup-time loading of heavy dependencies.
+
+Nothing heavy is imported when `main` is imported. Instead each dependency
+is loaded either here, in parallel threads during app startup, or lazily on
+first use. The time each one took is kept for the /metrics report.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+
+# module name -> milliseconds it took to load (or an error message)
+_report = {"mode": "lazy", "modules": {}, "total_ms": 0.0}
+
+
+def _load_pillow():
+    from PIL import Image
+
+    Image.init()
+
+
+def _load_opencv():
+    from video_utils import load_cv2
+
+    load_cv2()
+
+
+def _load_huggingface():
+    from detector import get_client
+
+    get_client()
+
+
+def _load_gemini():
+    from explainer import get_genai
+
+    get_genai()
+
+
+def _load_local_model():
+    from services.local_model import load_model
+
+    # Already loaded (and shared) if gunicorn preloaded it in the master
+    load_model()
+
+
+def _load_httpx():
+    from services.detector import get_client
+
+    get_client()
+
+
+def _loaders() -> dict:
+    """The loaders that apply to this deployment's configuration."""
+    loaders = {"pillow": _load_pillow, "gemini": _load_gemini}
+    if config.ENABLE_VIDEO:
+        loaders["opencv"] = _load_opencv
+    if config.DETECTOR_BACKEND == "huggingface":
+        loaders["huggingface_hub"] = _load_huggingface
+    elif config.DETECTOR_BACKEND == "local":
+        loaders["local_model"] = _load_local_model
+    else:
+        loaders["httpx"] = _load_httpx
+    return loaders
+
+
+def _timed_load(name: str, loader) -> tuple:
+    start = time.perf_counter()
+    try:
+        loader()
+        result = round((time.perf_counter() - start) * 1000, 2)
+    except Exception as e:
+        # A missing optional dependency should not stop the server booting
+        result = f"failed: {e}"
+    return name, result
+
+
+def warm_up() -> dict:
+    """Load every heavy dependency in parallel and return the timing report."""
+    if not config.PRELOAD_ON_STARTUP:
+        print("[Startup] PRELOAD_ON_STARTUP=0, dependencies load on first use")
+        return report()
+
+    loaders = _loaders()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(loaders)) as pool:
+        results = list(pool.map(lambda item: _timed_load(*item), loaders.items()))
+
+    _report["mode"] = "preload"
+    _report["modules"] = dict(results)
+    _report["total_ms"] = round((time.perf_counter() - start) * 1000, 2)
+
+    for name, result in results:
+        print(f"[Startup] {name}: {result}{' ms' if isinstance(result, float) else ''}")
+    print(f"[Startup] Ready in {_report['total_ms']} ms")
+    return report()
+
+
+def report() -> dict:
+    """Return a copy of the startup timing report."""
+    return {
+        "mode": _report["mode"],
+        "modules": dict(_report["modules"]),
+        "total_ms": _report["total_ms"],
+    }
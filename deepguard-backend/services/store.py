@@ -0,0 +1,182 @@
+"""
+Persistent verdict store.
+
+Every finished analysis is written to a small SQLite database in WAL mode,
+so analysts can look up past verdicts by file hash, perceptual hash or time
+range, and repeat uploads can be answered without paying for inference again.
+"""
+import json
+import sqlite3
+import threading
+import time
+
+import config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS verdicts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    sha256 TEXT NOT NULL,
+    phash TEXT,
+    filename TEXT,
+    file_type TEXT,
+    backend TEXT,
+    model_version TEXT,
+    score REAL,
+    raw_score REAL,
+    verdict TEXT,
+    frames INTEGER,
+    explanation TEXT,
+    timings TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_verdicts_sha256 ON verdicts (sha256, backend, model_version);
+CREATE INDEX IF NOT EXISTS idx_verdicts_phash ON verdicts (phash);
+CREATE INDEX IF NOT EXISTS idx_verdicts_created_at ON verdicts (created_at);
+"""
+
+COLUMNS = [
+    "id", "created_at", "sha256", "phash", "filename", "file_type", "backend",
+    "model_version", "score", "raw_score", "verdict", "frames", "explanation", "timings",
+]
+
+# Columns added since the first schema; databases created before get them on open
+ADDED_COLUMNS = [("raw_score", "REAL")]
+
+# One connection per thread (sqlite3 connections must not be shared)
+_local = threading.local()
+_schema_lock = threading.Lock()
+_schema_ready = False
+
+
+def enabled() -> bool:
+    return bool(config.STORE_PATH)
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(config.STORE_PATH, timeout=10, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def get_connection() -> sqlite3.Connection:
+    """Return this thread's connection, creating the schema on first use."""
+    global _schema_ready
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _connect()
+        _local.conn = conn
+    if not _schema_ready:
+        with _schema_lock:
+            if not _schema_ready:
+                conn.executescript(SCHEMA)
+                _add_columns(conn)
+                _schema_ready = True
+    return conn
+
+
+def _add_columns(conn: sqlite3.Connection):
+    existing = {row["name"] for row in conn.execute("PRAGMA table_info(verdicts)")}
+    for name, kind in ADDED_COLUMNS:
+        if name in existing:
+            continue
+        try:
+            conn.execute(f"ALTER TABLE verdicts ADD COLUMN {name} {kind}")
+        except sqlite3.OperationalError as e:
+            # Another worker added it first
+            if "duplicate column" not in str(e):
+                raise
+
+
+def _row_to_dict(row) -> dict:
+    record = dict(row)
+    if record.get("timings"):
+        record["timings"] = json.loads(record["timings"])
+    return record
+
+
+def record(analysis, model_version: str = "") -> int:
+    """Save a finished Analysis and return the new row id."""
+    conn = get_connection()
+    with conn:
+        cursor = conn.execute(
+            "INSERT INTO verdicts (created_at, sha256, phash, filename, file_type, backend, "
+            "model_version, score, raw_score, verdict, frames, explanation, timings) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                time.time(),
+                analysis.sha256,
+                analysis.phash or None,
+                analysis.filename,
+                analysis.file_type,
+                analysis.backend,
+                model_version,
+                analysis.score,
+                analysis.raw_score,
+                analysis.verdict,
+                len(analysis.frame_scores),
+                analysis.explanation,
+                json.dumps(analysis.timings),
+            ),
+        )
+    return cursor.lastrowid
+
+
+def find_latest(sha256: str, backend: str, model_version: str = ""):
+    """Most recent verdict for this exact file, backend and model, or None."""
+    row = get_connection().execute(
+        "SELECT * FROM verdicts WHERE sha256 = ? AND backend = ? AND model_version = ? "
+        "ORDER BY id DESC LIMIT 1",
+        (sha256, backend, model_version),
+    ).fetchone()
+    return _row_to_dict(row) if row else None
+
+
+def _where(sha256=None, phash=None, since=None, until=None) -> tuple:
+    clauses, params = [], []
+    if sha256:
+        clauses.append("sha256 = ?")
+        params.append(sha256)
+    if phash:
+        clauses.append("phash = ?")
+        params.append(phash)
+    if since is not None:
+        clauses.append("created_at >= ?")
+        params.append(since)
+    if until is not None:
+        clauses.append("created_at < ?")
+        params.append(until)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    return where, params
+
+
+def search(sha256=None, phash=None, since=None, until=None, limit: int = 100) -> list:
+    """Newest-first verdicts matching the filters (all of them optional)."""
+    where, params = _where(sha256, phash, since, until)
+    rows = get_connection().execute(
+        f"SELECT * FROM verdicts{where} ORDER BY created_at DESC LIMIT ?",
+        params + [limit],
+    ).fetchall()
+    return [_row_to_dict(row) for row in rows]
+
+
+def iter_rows(since=None, until=None, batch_size: int = 500):
+    """
+    Yield matching verdicts oldest-first, batch_size rows at a time, on a
+    private connection. Large exports never sit in memory all at once, and
+    the generator may be resumed from different threads.
+    """
+    where, params = _where(since=since, until=until)
+    get_connection()  # make sure the schema exists
+    conn = _connect()
+    try:
+        cursor = conn.execute(f"SELECT * FROM verdicts{where} ORDER BY created_at", params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield _row_to_dict(row)
+    finally:
+        conn.close()
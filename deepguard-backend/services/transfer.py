@@ -0,0 +1,88 @@
+"""
+Per-backend transfer profiles: how big, in which format and at what quality
+images are encoded before they go to a backend, and whether the request
+body is gzipped.
+
+Image models resize their input to a fixed size (224 or 384 pixels for most
+ViT/Swin classifiers) by scaling the shortest side, so anything sent beyond
+that is bandwidth the model throws away. A profile's `size` caps the
+shortest side at the model's input size, which leaves the model's own
+preprocessing with (almost) the same pixels it would have computed from
+the full-size image. Profiles come from config.TRANSFER_PROFILES; see
+benchmark_transfer.py for bytes on the wire and latency per setting.
+"""
+from dataclasses import dataclass
+
+import config
+
+FORMATS = {"jpeg", "webp"}
+
+
+@dataclass(frozen=True)
+class TransferProfile:
+    # Shortest side sent to the backend (0 = only MAX_IMAGE_SIDE applies)
+    size: int = 0
+    format: str = "jpeg"
+    quality: int = 90
+    # Gzip the request body (only where the backend's HTTP API accepts it)
+    gzip: bool = False
+
+    @property
+    def content_type(self) -> str:
+        return f"image/{self.format}"
+
+    def describe(self) -> str:
+        return f"size={self.size},format={self.format},quality={self.quality},gzip={int(self.gzip)}"
+
+
+def parse_profile(text: str) -> TransferProfile:
+    """Parse "size=384,format=webp,quality=85,gzip=1" (missing keys keep their defaults)."""
+    values = {}
+    for part in (text or "").split(","):
+        if not part.strip():
+            continue
+        key, _, value = part.partition("=")
+        key, value = key.strip().lower(), value.strip().lower()
+        if key in ("size", "quality"):
+            values[key] = int(value)
+        elif key == "format":
+            if value == "jpg":
+                value = "jpeg"
+            if value not in FORMATS:
+                raise ValueError(f"Unknown transfer format '{value}'. Choose from: {', '.join(sorted(FORMATS))}")
+            values[key] = value
+        elif key == "gzip":
+            values[key] = value in ("1", "true", "yes", "on")
+        else:
+            raise ValueError(f"Unknown transfer profile setting '{key}'")
+    profile = TransferProfile(**values)
+    if not 1 <= profile.quality <= 100 or profile.size < 0:
+        raise ValueError(f"Invalid transfer profile '{text}'")
+    return profile
+
+
+_profiles = {}
+
+
+def get_profile(backend_name: str) -> TransferProfile:
+    """The transfer profile for a backend (defaults if none is configured)."""
+    if backend_name not in _profiles:
+        _profiles[backend_name] = parse_profile(config.TRANSFER_PROFILES.get(backend_name, ""))
+    return _profiles[backend_name]
+
+
+def set_profile(backend_name: str, profile: TransferProfile):
+    """Override a backend's profile at runtime (used by benchmark_transfer.py)."""
+    _profiles[backend_name] = profile
+
+
+def encode_image(contents: bytes, profile: TransferProfile) -> bytes:
+    """Shrink and re-encode an uploaded image as the profile asks."""
+    from utils.image_processing import preprocess_image
+
+    return preprocess_image(contents, config.MAX_IMAGE_SIDE, profile.size, profile.format, profile.quality)
+
+
+def frame_options(profile: TransferProfile) -> dict:
+    """Keyword arguments for video_utils' frame sizing and encoding."""
+    return {"min_side": profile.size, "image_format": profile.format, "quality": profile.quality}
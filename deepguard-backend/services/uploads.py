@@ -0,0 +1,282 @@
+"""
+Resumable chunked uploads for large videos.
+
+A client creates an upload, then PATCHes chunks at explicit byte offsets,
+each with its own checksum. Chunks are appended to a file on disk, and the
+current offset is simply the file's size, so any worker can resume an
+upload after a dropped connection. While a video is still arriving, frames
+from the part already received are decoded and scored in the background,
+filling the score cache so the final analysis only scores what is left.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import re
+import time
+import traceback
+import uuid
+
+import config
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: only the per-process lock below applies
+    fcntl = None
+
+_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+# Chunks are written to disk in blocks of this size
+_WRITE_BLOCK = 1024 * 1024
+
+# Per-process state: one lock per upload (workers are kept apart by a file
+# lock on the data file), and which sampled frame positions were already
+# scored from a partial file
+_locks = {}
+_prefetched = {}
+_prefetching = {}
+
+
+class UploadError(Exception):
+    """Raised for rejected upload requests. Routes turn this into an HTTP error."""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def _meta_path(upload_id: str) -> str:
+    return os.path.join(config.UPLOAD_DIR, f"{upload_id}.json")
+
+
+def load_meta(upload_id: str) -> dict:
+    if not _ID_PATTERN.match(upload_id or ""):
+        raise UploadError("Upload not found", 404)
+    try:
+        with open(_meta_path(upload_id)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise UploadError("Upload not found", 404)
+
+
+def data_path(meta: dict) -> str:
+    return os.path.join(config.UPLOAD_DIR, f"{meta['upload_id']}.{meta['ext']}")
+
+
+def status(upload_id: str) -> dict:
+    """Current state of an upload: declared size, bytes received, complete or not."""
+    meta = load_meta(upload_id)
+    try:
+        offset = os.path.getsize(data_path(meta))
+    except FileNotFoundError:
+        # Deleted (analyzed, cancelled or expired) after the metadata was read
+        raise UploadError("Upload not found", 404)
+    return {
+        "upload_id": upload_id,
+        "filename": meta["filename"],
+        "size": meta["size"],
+        "offset": offset,
+        "complete": offset == meta["size"],
+    }
+
+
+def create(filename: str, size: int) -> dict:
+    """Register a new upload and create its empty data file."""
+    from services.pipeline import get_extension
+
+    ext = get_extension(filename or "")
+    if ext not in config.ALLOWED_EXTENSIONS:
+        raise UploadError(f"Invalid file type. Allowed: {', '.join(sorted(config.ALLOWED_EXTENSIONS))}")
+    if size <= 0:
+        raise UploadError("Upload size must be greater than 0")
+    limit = config.MAX_UPLOAD_SIZE if ext in config.VIDEO_EXTENSIONS else config.MAX_FILE_SIZE
+    if size > limit:
+        raise UploadError(f"File too large. Maximum size is {limit // (1024 * 1024)}MB", 413)
+
+    os.makedirs(config.UPLOAD_DIR, exist_ok=True)
+    sweep_expired()
+
+    meta = {
+        "upload_id": uuid.uuid4().hex,
+        "filename": filename,
+        "ext": ext,
+        "size": size,
+        "created_at": time.time(),
+    }
+    open(data_path(meta), "wb").close()
+    with open(_meta_path(meta["upload_id"]), "w") as f:
+        json.dump(meta, f)
+    return status(meta["upload_id"])
+
+
+def parse_checksum(header: str) -> bytes:
+    """
+    Parse an "Upload-Checksum: sha256 <digest>" header. The digest may be
+    base64 (as in the tus protocol) or hex.
+    """
+    parts = (header or "").strip().split(None, 1)
+    if len(parts) != 2 or parts[0].lower() != "sha256":
+        raise UploadError("Upload-Checksum must look like 'sha256 <base64 or hex digest>'")
+    value = parts[1].strip()
+    try:
+        if re.fullmatch(r"[0-9a-fA-F]{64}", value):
+            return bytes.fromhex(value)
+        digest = base64.b64decode(value, validate=True)
+    except ValueError:
+        raise UploadError("Upload-Checksum digest is not valid base64 or hex")
+    if len(digest) != 32:
+        raise UploadError("Upload-Checksum digest has the wrong length for sha256")
+    return digest
+
+
+async def append_chunk(upload_id: str, offset: int, checksum: str, body) -> dict:
+    """
+    Append one chunk (an async iterator of bytes) at `offset`. The offset
+    must equal the bytes received so far, and the chunk must match its
+    sha256 checksum; otherwise nothing is kept and the client can retry.
+    """
+    meta = load_meta(upload_id)
+    expected_digest = parse_checksum(checksum)
+    path = data_path(meta)
+    lock = _locks.setdefault(upload_id, asyncio.Lock())
+
+    async with lock:
+        try:
+            f = open(path, "r+b")
+        except FileNotFoundError:
+            raise UploadError("Upload not found", 404)
+        with f:
+            _lock_file(f)
+            current = os.fstat(f.fileno()).st_size
+            if offset != current:
+                raise UploadError(f"Upload-Offset {offset} does not match the current offset {current}", 409)
+
+            digest = hashlib.sha256()
+            received = 0
+            pending = bytearray()
+            max_chunk = config.MAX_CHUNK_SIZE_MB * 1024 * 1024
+
+            f.seek(offset)
+            try:
+                async for part in body:
+                    received += len(part)
+                    if received > max_chunk:
+                        raise UploadError(f"Chunk too large. Maximum is {config.MAX_CHUNK_SIZE_MB}MB", 413)
+                    if offset + received > meta["size"]:
+                        raise UploadError("Chunk goes past the declared upload size", 413)
+                    digest.update(part)
+                    pending += part
+                    if len(pending) >= _WRITE_BLOCK:
+                        await asyncio.to_thread(f.write, bytes(pending))
+                        pending.clear()
+                if pending:
+                    await asyncio.to_thread(f.write, bytes(pending))
+
+                if digest.digest() != expected_digest:
+                    # 460 is the tus protocol's "Checksum Mismatch" status
+                    raise UploadError("Chunk checksum does not match Upload-Checksum", 460)
+            except BaseException:
+                # Drop the partial chunk so the client can resend it at the same offset
+                f.truncate(offset)
+                raise
+
+    result = status(upload_id)
+    if meta["ext"] in config.VIDEO_EXTENSIONS and not result["complete"]:
+        _start_prefetch(meta)
+    return result
+
+
+def _lock_file(f):
+    """
+    Take an exclusive lock on an upload's data file, held until it is closed,
+    so two workers can never write chunks to the same upload at once.
+    """
+    if fcntl is None:
+        return
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        raise UploadError("Another chunk for this upload is still being written", 409)
+
+
+def _start_prefetch(meta: dict):
+    upload_id = meta["upload_id"]
+    if upload_id in _prefetching:
+        return
+    # Keep a reference to the task until it finishes
+    task = asyncio.get_running_loop().create_task(prefetch_scores(meta))
+    _prefetching[upload_id] = task
+    task.add_done_callback(lambda _: _prefetching.pop(upload_id, None))
+
+
+async def prefetch_scores(meta: dict):
+    """
+    Decode whichever sampled frames are already inside the received part of
+    the video and score them, so their scores are cached by the time the
+    upload completes. Frames past the received data are simply skipped.
+    """
+    from services.backends import get_backend
+    from services.pipeline import score_payload
+    from services.transfer import frame_options, get_profile
+    from video_utils import fit_within, frame_to_payload, read_available_frames
+
+    backend = get_backend()
+    as_arrays = getattr(backend, "accepts_arrays", False)
+    # Same sizing and encoding as the final analysis, so the cache keys match
+    options = frame_options(get_profile(backend.name))
+    done = _prefetched.setdefault(meta["upload_id"], set())
+    path = data_path(meta)
+
+    def decode() -> list:
+        items = []
+        for position, frame in read_available_frames(path, config.VIDEO_SAMPLE_FRAMES, set(done)):
+            frame = fit_within(frame, config.MAX_IMAGE_SIDE, options["min_side"])
+            payload = frame_to_payload(frame, as_arrays, options["image_format"], options["quality"])
+            if payload is not None:
+                items.append((position, payload))
+        # The last frame read may straddle the end of the received data and
+        # decode damaged, so leave it for the next pass
+        return items[:-1]
+
+    try:
+        items = await asyncio.to_thread(decode)
+        for position, payload in items:
+            result = await score_payload(backend, payload, meta["filename"])
+            if "error" not in result:
+                done.add(position)
+    except Exception:
+        # A partial file may simply not be decodable yet
+        traceback.print_exc()
+
+
+def delete(upload_id: str):
+    """Remove an upload's data and metadata."""
+    meta = load_meta(upload_id)
+    for path in (data_path(meta), _meta_path(upload_id)):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    _locks.pop(upload_id, None)
+    _prefetched.pop(upload_id, None)
+
+
+def sweep_expired():
+    """Delete uploads older than UPLOAD_TTL_HOURS."""
+    cutoff = time.time() - config.UPLOAD_TTL_HOURS * 3600
+    try:
+        names = os.listdir(config.UPLOAD_DIR)
+    except FileNotFoundError:
+        return
+    for name in names:
+        if not name.endswith(".json"):
+            continue
+        upload_id = name[:-5]
+        try:
+            if load_meta(upload_id)["created_at"] < cutoff:
+                delete(upload_id)
+        except (UploadError, ValueError, KeyError):
+            continue
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from services.calibration import (
+    IsotonicCalibrator,
+    PlattCalibrator,
+    fit_isotonic,
+    fit_platt,
+    from_dict,
+)
+
+
+@pytest.fixture
+def overlapping():
+    """Raw scores where the fake rate rises with the score but classes overlap."""
+    rng = np.random.default_rng(0)
+    labels = rng.integers(0, 2, 400)
+    scores = np.clip(0.35 + 0.3 * labels + rng.normal(0, 0.15, 400), 0, 1)
+    return scores, labels
+
+
+def test_platt_is_increasing_and_tracks_the_fake_rate(overlapping):
+    scores, labels = overlapping
+    calibrator = fit_platt(scores, labels)
+
+    assert isinstance(calibrator, PlattCalibrator)
+    assert calibrator.a < 0
+    curve = calibrator.apply(np.linspace(0, 1, 11))
+    assert np.all(np.diff(curve) > 0)
+    assert curve[0] < 0.1 and curve[-1] > 0.9
+    # Calibrated probabilities average out to the observed fake rate
+    assert calibrator.apply(scores).mean() == pytest.approx(labels.mean(), abs=0.02)
+
+
+def test_platt_stays_finite_on_separable_data():
+    calibrator = fit_platt([0.1, 0.2, 0.8, 0.9], [0, 0, 1, 1])
+    probabilities = calibrator.apply([0.0, 1.0])
+
+    assert np.all(np.isfinite([calibrator.a, calibrator.b]))
+    assert 0 < probabilities[0] < 0.5 < probabilities[1] < 1
+
+
+def test_isotonic_is_non_decreasing_within_zero_and_one(overlapping):
+    scores, labels = overlapping
+    calibrator = fit_isotonic(scores, labels)
+
+    assert isinstance(calibrator, IsotonicCalibrator)
+    assert np.all(np.diff(calibrator.x) >= 0)
+    assert np.all(np.diff(calibrator.y) >= 0)
+    curve = calibrator.apply(np.linspace(0, 1, 101))
+    assert np.all(np.diff(curve) >= 0)
+    assert curve.min() >= 0 and curve.max() <= 1
+
+
+def test_isotonic_pools_violators():
+    calibrator = fit_isotonic([0.1, 0.2, 0.3, 0.4], [0, 1, 0, 1])
+
+    # The middle pair (1, 0) is out of order and is pooled to 0.5
+    assert calibrator.apply([0.1, 0.25, 0.4]).tolist() == [0.0, 0.5, 1.0]
+
+
+@pytest.mark.parametrize("calibrator", [PlattCalibrator(-5.0, 2.5), IsotonicCalibrator([0, 1], [0.1, 0.9])])
+def test_round_trip_through_dict(calibrator):
+    restored = from_dict(calibrator.to_dict())
+    scores = np.linspace(0, 1, 5)
+    assert np.allclose(restored.apply(scores), calibrator.apply(scores))
+
+
+def test_unknown_method_is_rejected():
+    with pytest.raises(ValueError):
+        from_dict({"method": "beta"})
+
+
+def test_isotonic_merges_tied_scores_before_pooling():
+    in_order = fit_isotonic([0.2, 0.5, 0.5, 0.8], [0, 0, 1, 1])
+    swapped = fit_isotonic([0.2, 0.5, 0.5, 0.8], [0, 1, 0, 1])
+
+    assert in_order.to_dict() == swapped.to_dict()
+    assert in_order.apply([0.5]).tolist() == [0.5]
+    assert len(set(in_order.x)) == len(in_order.x)
+
+
+def test_isotonic_fit_does_not_depend_on_input_order(overlapping):
+    scores, labels = overlapping
+    # Rounded like frame scores, so many scores are tied
+    scores = np.round(scores, 2)
+    order = np.random.default_rng(3).permutation(len(scores))
+
+    fitted = fit_isotonic(scores, labels)
+    shuffled = fit_isotonic(scores[order], labels[order])
+
+    assert fitted.to_dict() == shuffled.to_dict()
+    assert np.all(np.diff(fitted.x) > 0)
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from evaluate import cross_validated, expected_calibration_error, roc_curve
+from services.calibration import fit_isotonic
+
+
+def test_roc_curve_perfect_separation():
+    scores = np.array([0.1, 0.2, 0.3, 0.7, 0.8, 0.9])
+    labels = np.array([0, 0, 0, 1, 1, 1])
+    fpr, tpr, thresholds, auc = roc_curve(scores, labels)
+
+    assert auc == pytest.approx(1.0)
+    assert fpr[0] == 0 and tpr[0] == 0
+    assert fpr[-1] == 1 and tpr[-1] == 1
+    assert thresholds[0] == np.inf
+    # Every fake is found before the first real file is flagged
+    assert tpr[fpr == 0].max() == 1
+
+
+def test_roc_curve_inverted_scores():
+    scores = np.array([0.9, 0.8, 0.2, 0.1])
+    labels = np.array([0, 0, 1, 1])
+    assert roc_curve(scores, labels)[3] == pytest.approx(0.0)
+
+
+def test_roc_curve_ties_make_one_point():
+    scores = np.array([0.5, 0.5, 0.5, 0.5])
+    labels = np.array([0, 1, 0, 1])
+    fpr, tpr, thresholds, auc = roc_curve(scores, labels)
+
+    assert len(thresholds) == 2
+    assert auc == pytest.approx(0.5)
+
+
+def test_roc_curve_random_scores_near_half():
+    rng = np.random.default_rng(0)
+    auc = roc_curve(rng.random(4000), rng.integers(0, 2, 4000))[3]
+    assert auc == pytest.approx(0.5, abs=0.03)
+
+
+def test_cross_validated_scores_are_held_out():
+    rng = np.random.default_rng(1)
+    labels = rng.integers(0, 2, 300)
+    scores = np.clip(0.35 + 0.3 * labels + rng.normal(0, 0.15, 300), 0, 1)
+
+    in_sample = fit_isotonic(scores, labels).apply(scores)
+    held_out = cross_validated(scores, labels, fit_isotonic, folds=5)
+
+    assert held_out.shape == scores.shape
+    assert not np.allclose(held_out, in_sample)
+    # Fitting and measuring on the same files flatters the calibrator
+    assert expected_calibration_error(in_sample, labels) < expected_calibration_error(held_out, labels)
@@ -0,0 +1,73 @@
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from utils.frame_ring import END_OF_STREAM, FrameRing, RingTimeout
+
+
+@pytest.fixture
+def ring():
+    ring = FrameRing(multiprocessing.get_context("spawn"), slots=2, max_side=8)
+    yield ring
+    ring.close()
+
+
+def _frame(value, height=4, width=6):
+    return np.full((height, width, 3), value, dtype=np.uint8)
+
+
+def test_put_get_round_trip(ring):
+    ring.put(0, _frame(7))
+    ring.put(1, _frame(9, height=8, width=2))
+
+    index, view = ring.get(timeout=1)
+    assert index == 0
+    assert view.shape == (4, 6, 3)
+    assert (view == 7).all()
+    del view
+    ring.release()
+
+    index, view = ring.get(timeout=1)
+    assert index == 1
+    assert view.shape == (8, 2, 3)
+    assert (view == 9).all()
+    del view
+    ring.release()
+
+
+def test_end_of_stream(ring):
+    ring.put(0, _frame(1))
+    ring.put_end()
+
+    assert ring.get(timeout=1)[0] == 0
+    ring.release()
+    assert ring.get(timeout=1) == (END_OF_STREAM, None)
+    ring.release()
+
+
+def test_slots_are_reused_after_release(ring):
+    for index in range(5):
+        ring.put(index, _frame(index))
+        got, view = ring.get(timeout=1)
+        assert got == index
+        assert (view == index).all()
+        del view
+        ring.release()
+
+
+def test_put_blocks_when_full(ring):
+    ring.put(0, _frame(1))
+    ring.put(1, _frame(2))
+    with pytest.raises(RingTimeout):
+        ring.put(2, _frame(3), timeout=0.05)
+
+
+def test_get_times_out_when_empty(ring):
+    with pytest.raises(RingTimeout):
+        ring.get(timeout=0.05)
+
+
+def test_rejects_frames_larger_than_a_slot(ring):
+    with pytest.raises(ValueError):
+        ring.put(0, _frame(1, height=9, width=4))
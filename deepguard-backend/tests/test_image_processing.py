@@ -0,0 +1,75 @@
+import io
+
+import pytest
+from PIL import Image
+
+from utils.image_processing import inspect_image_bytes, validate_image_bytes
+
+
+def _encode(image_format: str, size=(64, 48), frames: int = 1, mode="RGB") -> bytes:
+    images = [Image.new(mode, size, (i * 40, 10, 10)) for i in range(frames)]
+    buffer = io.BytesIO()
+    if frames > 1:
+        images[0].save(buffer, image_format, save_all=True, append_images=images[1:])
+    else:
+        images[0].save(buffer, image_format)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("image_format", ["JPEG", "PNG", "WEBP"])
+def test_accepts_supported_formats(image_format):
+    result = inspect_image_bytes(_encode(image_format))
+    assert result == {"valid": True, "format": image_format, "width": 64, "height": 48}
+    assert validate_image_bytes(_encode(image_format))["valid"]
+
+
+def test_accepts_multi_picture_jpeg_as_jpeg():
+    # Phone JPEGs with an embedded preview or depth map open as MPO
+    contents = _encode("MPO", frames=2)
+    assert Image.open(io.BytesIO(contents)).format == "MPO"
+
+    result = inspect_image_bytes(contents, max_frames=1)
+    assert result == {"valid": True, "format": "JPEG", "width": 64, "height": 48}
+    assert validate_image_bytes(contents)["valid"]
+
+
+def test_rejects_other_formats():
+    result = inspect_image_bytes(_encode("GIF", mode="P"))
+    assert not result["valid"]
+    assert "GIF" in result["error"]
+
+
+def test_rejects_non_images():
+    assert inspect_image_bytes(b"not an image") == {"valid": False, "error": "File is not a valid image."}
+
+
+def test_pixel_budget_is_checked_from_the_header():
+    contents = _encode("PNG", size=(100, 100))
+    assert inspect_image_bytes(contents, max_pixels=10_000)["valid"]
+
+    result = inspect_image_bytes(contents, max_pixels=9_999)
+    assert not result["valid"]
+    assert "too many pixels" in result["error"]
+
+
+def test_dimension_limit():
+    result = inspect_image_bytes(_encode("PNG", size=(300, 10)), max_dimension=299)
+    assert not result["valid"]
+    assert "300x10" in result["error"]
+
+
+def test_frame_limit():
+    contents = _encode("WEBP", frames=3)
+    assert inspect_image_bytes(contents, max_frames=3)["valid"]
+
+    result = inspect_image_bytes(contents, max_frames=2)
+    assert not result["valid"]
+    assert "too many frames" in result["error"]
+
+
+def test_decompression_bomb_is_rejected_before_decoding(monkeypatch):
+    # Pillow raises from Image.open itself above twice its process-wide limit
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 1_000)
+    result = inspect_image_bytes(_encode("PNG", size=(100, 100)))
+    assert not result["valid"]
+    assert "too many pixels" in result["error"]
@@ -0,0 +1,172 @@
+import asyncio
+import base64
+import fcntl
+import hashlib
+import io
+import os
+
+import pytest
+from PIL import Image
+
+import config
+from services import uploads
+from services.uploads import UploadError, append_chunk, parse_checksum
+
+
+@pytest.fixture(autouse=True)
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "UPLOAD_DIR", str(tmp_path))
+    return tmp_path
+
+
+def _checksum(data: bytes, encoding: str = "base64") -> str:
+    digest = hashlib.sha256(data).digest()
+    if encoding == "hex":
+        return f"sha256 {digest.hex()}"
+    return f"sha256 {base64.b64encode(digest).decode()}"
+
+
+async def _body(*parts):
+    for part in parts:
+        yield part
+
+
+def _append(upload_id, offset, checksum, *parts):
+    return asyncio.run(append_chunk(upload_id, offset, checksum, _body(*parts)))
+
+
+def _received(upload: dict) -> bytes:
+    with open(uploads.data_path(uploads.load_meta(upload["upload_id"])), "rb") as f:
+        return f.read()
+
+
+# ---------------------------------------------------------------- parse_checksum
+
+
+def test_parse_checksum_accepts_base64_and_hex():
+    digest = hashlib.sha256(b"chunk").digest()
+    assert parse_checksum(_checksum(b"chunk")) == digest
+    assert parse_checksum(_checksum(b"chunk", "hex")) == digest
+    assert parse_checksum(f"SHA256 {digest.hex().upper()}") == digest
+
+
+@pytest.mark.parametrize("header", [
+    None,
+    "",
+    "sha256",
+    "md5 " + base64.b64encode(b"x" * 16).decode(),
+    "sha256 not-base64!",
+    "sha256 " + base64.b64encode(b"short").decode(),
+])
+def test_parse_checksum_rejects_bad_headers(header):
+    with pytest.raises(UploadError) as error:
+        parse_checksum(header)
+    assert error.value.status_code == 400
+
+
+# ---------------------------------------------------------------- append_chunk
+
+
+def test_append_chunks_in_order():
+    upload = uploads.create("photo.jpg", 10)
+
+    result = _append(upload["upload_id"], 0, _checksum(b"hello"), b"hel", b"lo")
+    assert result["offset"] == 5
+    assert not result["complete"]
+
+    result = _append(upload["upload_id"], 5, _checksum(b"world"), b"world")
+    assert result["offset"] == 10
+    assert result["complete"]
+    assert _received(upload) == b"helloworld"
+
+
+def test_wrong_offset_is_rejected():
+    upload = uploads.create("photo.jpg", 10)
+    _append(upload["upload_id"], 0, _checksum(b"hello"), b"hello")
+
+    with pytest.raises(UploadError) as error:
+        _append(upload["upload_id"], 3, _checksum(b"world"), b"world")
+    assert error.value.status_code == 409
+    assert _received(upload) == b"hello"
+
+
+def test_checksum_mismatch_drops_the_chunk():
+    upload = uploads.create("photo.jpg", 10)
+    _append(upload["upload_id"], 0, _checksum(b"hello"), b"hello")
+
+    with pytest.raises(UploadError) as error:
+        _append(upload["upload_id"], 5, _checksum(b"other"), b"world")
+    assert error.value.status_code == 460
+    # Truncated back to the offset, so the same chunk can be resent
+    assert _received(upload) == b"hello"
+    assert _append(upload["upload_id"], 5, _checksum(b"world"), b"world")["complete"]
+
+
+def test_chunk_past_the_declared_size_is_dropped():
+    upload = uploads.create("photo.jpg", 4)
+
+    with pytest.raises(UploadError) as error:
+        _append(upload["upload_id"], 0, _checksum(b"hello"), b"hel", b"lo")
+    assert error.value.status_code == 413
+    assert _received(upload) == b""
+
+
+def test_chunk_is_rejected_while_another_worker_holds_the_file():
+    upload = uploads.create("photo.jpg", 5)
+    path = uploads.data_path(uploads.load_meta(upload["upload_id"]))
+
+    with open(path, "r+b") as other:
+        fcntl.flock(other.fileno(), fcntl.LOCK_EX)
+        with pytest.raises(UploadError) as error:
+            _append(upload["upload_id"], 0, _checksum(b"hello"), b"hello")
+    assert error.value.status_code == 409
+
+    assert _append(upload["upload_id"], 0, _checksum(b"hello"), b"hello")["complete"]
+
+
+# ---------------------------------------------------------------- deleted uploads
+
+
+def test_status_of_an_upload_whose_data_is_gone():
+    upload = uploads.create("photo.jpg", 5)
+    os.remove(uploads.data_path(uploads.load_meta(upload["upload_id"])))
+
+    with pytest.raises(UploadError) as error:
+        uploads.status(upload["upload_id"])
+    assert error.value.status_code == 404
+
+
+def test_chunk_for_an_upload_whose_data_is_gone():
+    upload = uploads.create("photo.jpg", 5)
+    os.remove(uploads.data_path(uploads.load_meta(upload["upload_id"])))
+
+    with pytest.raises(UploadError) as error:
+        _append(upload["upload_id"], 0, _checksum(b"hello"), b"hello")
+    assert error.value.status_code == 404
+
+
+def test_analyze_still_answers_when_the_upload_was_already_deleted(monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from routers import uploads as upload_routes
+
+    contents = io.BytesIO()
+    Image.new("RGB", (32, 32), (10, 20, 30)).save(contents, "PNG")
+    contents = contents.getvalue()
+    upload = uploads.create("photo.png", len(contents))
+    _append(upload["upload_id"], 0, _checksum(contents), contents)
+
+    async def analyze_and_lose_the_upload(analysis, *args, **kwargs):
+        # Another request (or the expiry sweep) removes the upload meanwhile
+        uploads.delete(upload["upload_id"])
+        analysis.verdict, analysis.score = "REAL", 0.1
+        yield {"event": "result"}
+
+    monkeypatch.setattr(upload_routes, "analyze_stream", analyze_and_lose_the_upload)
+    app = FastAPI()
+    app.include_router(upload_routes.router)
+
+    response = TestClient(app).post(f"/uploads/{upload['upload_id']}/analyze")
+    assert response.status_code == 200
+    assert response.json()["verdict"] == "REAL"
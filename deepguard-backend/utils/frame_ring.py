@@ -0,0 +1,137 @@
+"""
+Shared-memory ring buffer for handing raw video frames between processes.
+
+The decoder process writes BGR frames straight into a fixed set of slots in
+one shared memory block and the scorer reads them as numpy views, so frames
+are never pickled or re-encoded on the way. Two semaphores give
+backpressure: the decoder blocks when every slot is full, the reader blocks
+when every slot is empty.
+"""
+import numpy as np
+from multiprocessing import shared_memory
+
+# Per-slot header: frame index, height, width
+HEADER_FIELDS = 3
+END_OF_STREAM = -1
+
+
+class RingTimeout(Exception):
+    """Raised when the other side of the ring did not respond in time."""
+
+
+class FrameRing:
+    """Single-producer, single-consumer ring of fixed-size frame slots."""
+
+    def __init__(self, ctx, slots: int = 4, max_side: int = 1024):
+        self.slots = max(1, slots)
+        self.max_side = max_side
+        self.slot_bytes = max_side * max_side * 3
+        self._frames = shared_memory.SharedMemory(create=True, size=self.slots * self.slot_bytes)
+        self._header = shared_memory.SharedMemory(create=True, size=self.slots * HEADER_FIELDS * 8)
+        self._free = ctx.Semaphore(self.slots)
+        self._filled = ctx.Semaphore(0)
+        self._owner = True
+        self._write_pos = 0
+        self._read_pos = 0
+        self._map()
+
+    # Only names and semaphores travel to the decoder process; it re-attaches
+    def __getstate__(self):
+        return {
+            "slots": self.slots,
+            "max_side": self.max_side,
+            "slot_bytes": self.slot_bytes,
+            "frames_name": self._frames.name,
+            "header_name": self._header.name,
+            "free": self._free,
+            "filled": self._filled,
+        }
+
+    def __setstate__(self, state):
+        self.slots = state["slots"]
+        self.max_side = state["max_side"]
+        self.slot_bytes = state["slot_bytes"]
+        self._frames = shared_memory.SharedMemory(name=state["frames_name"])
+        self._header = shared_memory.SharedMemory(name=state["header_name"])
+        self._free = state["free"]
+        self._filled = state["filled"]
+        self._owner = False
+        self._write_pos = 0
+        self._read_pos = 0
+        self._map()
+
+    def _map(self):
+        self._header_view = np.ndarray(
+            (self.slots, HEADER_FIELDS), dtype=np.int64, buffer=self._header.buf
+        )
+
+    def _slot_view(self, slot: int, height: int, width: int) -> np.ndarray:
+        return np.ndarray(
+            (height, width, 3),
+            dtype=np.uint8,
+            buffer=self._frames.buf,
+            offset=slot * self.slot_bytes,
+        )
+
+    # ------------------------------------------------------------ producer
+
+    def put(self, index: int, frame: np.ndarray, timeout: float = None):
+        """Copy a BGR frame (at most max_side x max_side) into the next free slot."""
+        height, width = frame.shape[:2]
+        if height > self.max_side or width > self.max_side:
+            raise ValueError(f"Frame {width}x{height} does not fit a {self.max_side}px slot")
+
+        if not self._free.acquire(timeout=timeout):
+            raise RingTimeout("Reader did not free a slot in time")
+        slot = self._write_pos % self.slots
+        self._slot_view(slot, height, width)[:] = frame
+        self._header_view[slot] = (index, height, width)
+        self._write_pos += 1
+        self._filled.release()
+
+    def put_end(self, timeout: float = None):
+        """Tell the reader no more frames are coming."""
+        if not self._free.acquire(timeout=timeout):
+            raise RingTimeout("Reader did not free a slot in time")
+        slot = self._write_pos % self.slots
+        self._header_view[slot] = (END_OF_STREAM, 0, 0)
+        self._write_pos += 1
+        self._filled.release()
+
+    # ------------------------------------------------------------ consumer
+
+    def get(self, timeout: float = None):
+        """
+        Wait for the next frame and return (index, view). The view points
+        into shared memory and is only valid until release() is called.
+        Returns (END_OF_STREAM, None) once the decoder is finished.
+        """
+        if not self._filled.acquire(timeout=timeout):
+            raise RingTimeout("Decoder did not produce a frame in time")
+        slot = self._read_pos % self.slots
+        index, height, width = (int(v) for v in self._header_view[slot])
+        if index == END_OF_STREAM:
+            return END_OF_STREAM, None
+        return index, self._slot_view(slot, height, width)
+
+    def release(self):
+        """Hand the slot returned by the last get() back to the decoder."""
+        self._read_pos += 1
+        self._free.release()
+
+    # ------------------------------------------------------------ cleanup
+
+    def close(self):
+        """Detach from shared memory; the creating process also unlinks it."""
+        self._header_view = None
+        for block in (self._frames, self._header):
+            if self._owner:
+                try:
+                    block.unlink()
+                except FileNotFoundError:
+                    pass
+            try:
+                block.close()
+            except BufferError:
+                # A numpy view is still alive; the mapping goes away with it
+                pass
@@ -1,42 +1,74 @@
 from io import BytesIO
 from PIL import Image
-from fastapi import UploadFile
 
-ALLOWED_EXTENSIONS = {"jpg", "jpeg", "png", "webp"}
-MAX_FILE_SIZE_MB = 10
-MAX_FILE_SIZE_BYTES = MAX_FILE_SIZE_MB * 1024 * 1024
+import config
 
+# Formats accepted by the header check (the pixel budgets are in config.py)
+IMAGE_FORMATS = {"JPEG", "PNG", "WEBP", "MPO"}
 
-def get_file_extension(filename: str) -> str:
-    """Extract and return the lowercase file extension."""
-    if "." not in filename:
-        return ""
-    return filename.rsplit(".", 1)[1].lower()
+# Phone and camera JPEGs with an embedded preview or depth map open as MPO;
+# they are treated as JPEG and judged on their first (primary) picture
+JPEG_LIKE_FORMATS = {"MPO"}
 
+# Pillow's own bomb check backs up the header check on every Image.open (it
+# warns above the limit and raises above twice the limit). It is process-wide,
+# so it is set once here rather than per request.
+Image.MAX_IMAGE_PIXELS = config.MAX_IMAGE_PIXELS
 
-async def validate_image(file: UploadFile) -> dict:
+
+def inspect_image_bytes(
+    contents: bytes,
+    max_pixels: int = config.MAX_IMAGE_PIXELS,
+    max_dimension: int = config.MAX_IMAGE_DIMENSION,
+    max_frames: int = config.MAX_IMAGE_FRAMES,
+) -> dict:
     """
-    Validate the uploaded file:
-    - Must have an allowed image extension (jpg, jpeg, png, webp)
-    - Must not exceed 10MB
+    Check format, dimensions and frame count from the image header only
+    (Image.open is lazy), so a small file that would decode to gigabytes of
+    pixels is rejected before any pixel data is decompressed.
     Returns dict with 'valid' bool and optional 'error' message.
     """
-    extension = get_file_extension(file.filename or "")
-    if extension not in ALLOWED_EXTENSIONS:
+    try:
+        image = Image.open(BytesIO(contents))
+    except Image.DecompressionBombError:
+        return {"valid": False, "error": f"Image has too many pixels. Maximum is {max_pixels:,}."}
+    except Exception:
+        return {"valid": False, "error": "File is not a valid image."}
+
+    if image.format not in IMAGE_FORMATS:
+        return {"valid": False, "error": f"Unsupported image format '{image.format}'."}
+    image_format = "JPEG" if image.format in JPEG_LIKE_FORMATS else image.format
+
+    width, height = image.size
+    if width < 1 or height < 1 or max(width, height) > max_dimension:
         return {
             "valid": False,
-            "error": f"Invalid file type '.{extension}'. Allowed: {', '.join(ALLOWED_EXTENSIONS)}",
+            "error": f"Image dimensions {width}x{height} are not allowed. Maximum side is {max_dimension}px.",
         }
+    if width * height > max_pixels:
+        return {"valid": False, "error": f"Image has too many pixels. Maximum is {max_pixels:,}."}
+    if image_format != "JPEG" and getattr(image, "n_frames", 1) > max_frames:
+        return {"valid": False, "error": f"Image has too many frames. Maximum is {max_frames}."}
+
+    return {"valid": True, "format": image_format, "width": width, "height": height}
 
-    contents = await file.read()
-    await file.seek(0)
 
-    if len(contents) > MAX_FILE_SIZE_BYTES:
+def validate_image_bytes(contents: bytes, max_size: int = config.MAX_FILE_SIZE, **budgets) -> dict:
+    """
+    Check the size of already-read image bytes, the header against the pixel
+    budgets (see inspect_image_bytes), and that Pillow can parse the file.
+    Returns dict with 'valid' bool and optional 'error' message.
+    """
+    if len(contents) > max_size:
         return {
             "valid": False,
-            "error": f"File too large. Maximum size is {MAX_FILE_SIZE_MB}MB.",
+            "error": f"File too large. Maximum size is {max_size // (1024 * 1024)}MB.",
         }
 
+    header = inspect_image_bytes(contents, **budgets)
+    if not header["valid"]:
+        return header
+
     try:
         image = Image.open(BytesIO(contents))
         image.verify()
@@ -49,19 +81,59 @@ async def validate_image(file: UploadFile) -> dict:
     return {"valid": True}
 
 
-def preprocess_image(image_bytes: bytes) -> bytes:
+def scaled_size(width: int, height: int, max_side: int, min_side: int = 0) -> tuple:
+    """
+    Size after shrinking so the longest side is at most max_side and, if
+    min_side is set, the shortest side is at most min_side. Never enlarges.
+    """
+    scale = min(1.0, max_side / max(width, height))
+    if min_side:
+        scale = min(scale, min_side / min(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def preprocess_image(image_bytes: bytes, max_size: int = 1024, min_side: int = 0,
+                     image_format: str = "jpeg", quality: int = 90) -> bytes:
     """
-    Open the image with Pillow, convert to RGB, and return as JPEG bytes.
+    Open the image with Pillow, convert to RGB, shrink it (see scaled_size)
+    and return it as JPEG or WebP bytes.
     This ensures a consistent format is sent to the model API.
+    Large JPEGs are decoded at a reduced scale (1/2, 1/4 or 1/8) that is
+    still at least the target size, so they are never fully decoded.
     """
     image = Image.open(BytesIO(image_bytes))
+    size = scaled_size(*image.size, max_size, min_side)
+    image.draft("RGB", size)
     image = image.convert("RGB")
 
-    max_size = 1024
-    if max(image.size) > max_size:
-        image.thumbnail((max_size, max_size), Image.LANCZOS)
+    if image.size != size:
+        image = image.resize(size, Image.LANCZOS, reducing_gap=3.0)
 
     output = BytesIO()
-    image.save(output, format="JPEG", quality=90)
+    image.save(output, format=image_format.upper(), quality=quality)
     output.seek(0)
     return output.read()
+
+
+def dhash(image, hash_size: int = 8) -> str:
+    """
+    Perceptual "difference hash" of an image (bytes or an RGB numpy array),
+    as a 16-character hex string. Near-identical images (re-encoded,
+    resized) get the same or a very close hash.
+    """
+    if isinstance(image, (bytes, bytearray)):
+        image = Image.open(BytesIO(image))
+        # JPEGs only need decoding at 1/8 scale for a 9x8 hash
+        image.draft("L", (hash_size * 8, hash_size * 8))
+    else:
+        image = Image.fromarray(image)
+    image = image.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR)
+    pixels = list(image.getdata())
+
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            value = (value << 1) | (1 if left > right else 0)
+    return f"{value:0{hash_size * hash_size // 4}x}"
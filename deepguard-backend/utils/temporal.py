@@ -0,0 +1,268 @@
+"""
+Cheap temporal and audio signals for video analysis.
+
+The frame sampler reads each sampled frame plus the frame right after it
+(the decoder is already positioned there, so this costs one extra decode per
+sample, not another pass over the file). TemporalProbe keeps small grayscale
+copies of those pairs and measures, vectorized across all pairs:
+
+- flicker: brightness change left over after motion compensation
+  (dense optical flow), which generated faces tend to show between frames
+- face_jitter: how far the detected face box moves relative to the motion
+  around it, a landmark-free stand-in for landmark jitter
+"""
+import numpy as np
+
+# Pairs are analysed at this width (keeps optical flow at ~1 ms per pair)
+PROBE_WIDTH = 160
+
+# Residual flicker (gray levels) that maps to 0 and to 1 in temporal_score
+FLICKER_BASELINE = 1.5
+FLICKER_SCALE = 8.0
+
+# Face-box jitter (fraction of the box size) that maps to 1 in temporal_score
+JITTER_SCALE = 0.15
+
+
+def _load_cv2():
+    from video_utils import load_cv2
+
+    return load_cv2()
+
+
+class TemporalProbe:
+    """Collects (frame, next frame) pairs during decoding and summarizes them."""
+
+    def __init__(self, width: int = PROBE_WIDTH):
+        self.width = width
+        self.current = []
+        self.following = []
+
+    def _shrink(self, frame):
+        cv2 = _load_cv2()
+        height, width = frame.shape[:2]
+        size = (self.width, max(1, int(height * self.width / width)))
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+
+    def add_pair(self, frame, next_frame):
+        """Record one sampled BGR frame and the frame that follows it."""
+        self.current.append(self._shrink(frame))
+        self.following.append(self._shrink(next_frame))
+
+    def summary(self) -> dict:
+        """Temporal signals over every recorded pair (empty if there were none)."""
+        if not self.current:
+            return {}
+        cv2 = _load_cv2()
+
+        current = np.stack(self.current).astype(np.float32)
+        following = np.stack(self.following).astype(np.float32)
+        count, height, width = current.shape
+
+        # Dense flow per pair, then warp each next frame back onto its frame
+        grid_x, grid_y = np.meshgrid(np.arange(width, dtype=np.float32), np.arange(height, dtype=np.float32))
+        flows = np.stack([
+            cv2.calcOpticalFlowFarneback(a, b, None, 0.5, 2, 9, 2, 5, 1.1, 0)
+            for a, b in zip(self.current, self.following)
+        ])
+        warped = np.stack([
+            cv2.remap(following[i], grid_x + flows[i, ..., 0], grid_y + flows[i, ..., 1], cv2.INTER_LINEAR)
+            for i in range(count)
+        ])
+
+        # Vectorized across all pairs at once
+        residual = np.abs(current - warped).mean(axis=(1, 2))
+        motion = np.linalg.norm(flows, axis=-1).mean(axis=(1, 2))
+        raw_diff = np.abs(current - following).mean(axis=(1, 2))
+
+        flicker = float(np.median(residual))
+        signals = {
+            "pairs": int(count),
+            "flicker": round(flicker, 4),
+            "motion": round(float(motion.mean()), 4),
+            "frame_diff": round(float(raw_diff.mean()), 4),
+        }
+        parts = [np.clip((flicker - FLICKER_BASELINE) / FLICKER_SCALE, 0.0, 1.0)]
+
+        jitter = self._face_jitter(flows)
+        if jitter is not None:
+            signals["face_jitter"] = round(jitter, 4)
+            parts.append(np.clip(jitter / JITTER_SCALE, 0.0, 1.0))
+
+        signals["temporal_score"] = round(float(np.mean(parts)), 4)
+        return signals
+
+    def _face_jitter(self, flows):
+        """
+        Median distance the face box moves beyond what the optical flow
+        inside the box explains, as a fraction of the box size.
+        """
+        cv2 = _load_cv2()
+        cascade = _face_cascade()
+        if cascade is None:
+            return None
+
+        jitters = []
+        for i, (a, b) in enumerate(zip(self.current, self.following)):
+            faces_a = cascade.detectMultiScale(a, 1.1, 3, minSize=(16, 16))
+            faces_b = cascade.detectMultiScale(b, 1.1, 3, minSize=(16, 16))
+            if len(faces_a) == 0 or len(faces_b) == 0:
+                continue
+            # Largest face in each frame
+            xa, ya, wa, ha = max(faces_a, key=lambda f: f[2] * f[3])
+            xb, yb, wb, hb = max(faces_b, key=lambda f: f[2] * f[3])
+            box_shift = np.array([xb + wb / 2 - (xa + wa / 2), yb + hb / 2 - (ya + ha / 2)])
+            flow_shift = flows[i, ya:ya + ha, xa:xa + wa].reshape(-1, 2).mean(axis=0)
+            jitters.append(np.linalg.norm(box_shift - flow_shift) / max(wa, ha))
+        if not jitters:
+            return None
+        return float(np.median(jitters))
+
+
+_cascade = None
+
+
+def _face_cascade():
+    """OpenCV's bundled frontal-face Haar cascade (None if it is missing)."""
+    global _cascade
+    if _cascade is None:
+        cv2 = _load_cv2()
+        try:
+            cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+        except AttributeError:
+            return None
+        _cascade = cascade if not cascade.empty() else False
+    return _cascade or None
+
+
+# ---------------------------------------------------------------- audio
+
+
+# OpenCV capture backends that can decode audio tracks
+_AUDIO_BACKENDS = ("CAP_MSMF", "CAP_GSTREAMER")
+
+
+def _opencv_audio_backend(cv2):
+    """
+    The first capture backend this OpenCV build can read audio with, or None.
+    Other backends (e.g. FFMPEG in the pip wheels) reject the audio
+    parameters and log an error for every file, so they are never tried.
+    """
+    if not hasattr(cv2, "CAP_PROP_AUDIO_STREAM"):
+        return None
+    from cv2 import videoio_registry
+
+    for name in _AUDIO_BACKENDS:
+        backend = getattr(cv2, name, None)
+        if backend is not None and videoio_registry.hasBackend(backend):
+            return backend
+    return None
+
+
+def _read_audio_opencv(video_path):
+    """Audio as (mono float32 samples, sample rate) via OpenCV, or None."""
+    cv2 = _load_cv2()
+    backend = _opencv_audio_backend(cv2)
+    if backend is None:
+        return None
+    # Only the audio stream is opened, so no video frames are decoded here
+    params = [
+        cv2.CAP_PROP_AUDIO_STREAM, 0,
+        cv2.CAP_PROP_VIDEO_STREAM, -1,
+        cv2.CAP_PROP_AUDIO_DATA_DEPTH, cv2.CV_32F,
+    ]
+    cap = cv2.VideoCapture(video_path, backend, params)
+    try:
+        if not cap.isOpened():
+            return None
+        base = int(cap.get(cv2.CAP_PROP_AUDIO_BASE_INDEX))
+        rate = cap.get(cv2.CAP_PROP_AUDIO_SAMPLES_PER_SECOND)
+        chunks = []
+        while cap.grab():
+            success, chunk = cap.retrieve(None, base)
+            if success and chunk is not None:
+                chunks.append(np.asarray(chunk, dtype=np.float32).reshape(-1))
+        if not chunks:
+            return None
+        return np.concatenate(chunks), rate
+    finally:
+        cap.release()
+
+
+def _read_audio_pyav(video_path):
+    """Audio as (mono float32 samples, sample rate) via PyAV, or None."""
+    import av
+
+    with av.open(video_path) as container:
+        stream = next((s for s in container.streams if s.type == "audio"), None)
+        if stream is None:
+            return None
+        chunks = []
+        for frame in container.decode(stream):
+            samples = frame.to_ndarray()
+            if np.issubdtype(samples.dtype, np.integer):
+                samples = samples / float(np.iinfo(samples.dtype).max)
+            samples = samples.astype(np.float32)
+            # Planar audio is (channels, samples); packed is (1, samples * channels)
+            if frame.format.is_planar:
+                samples = samples.mean(axis=0)
+            else:
+                samples = samples.reshape(-1, len(frame.layout.channels)).mean(axis=1)
+            chunks.append(samples)
+        if not chunks:
+            return None
+        return np.concatenate(chunks), float(stream.rate)
+
+
+def _has_pyav() -> bool:
+    try:
+        import av  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def audio_features(video_path, window: int = 2048) -> dict:
+    """
+    Summary features of the audio track, vectorized over fixed windows:
+    loudness, share of near-silent windows, zero-crossing rate and spectral
+    flatness (close to 1 for noise-like audio). Uses PyAV if it is installed,
+    else OpenCV where the build has an audio backend (e.g. MSMF on Windows).
+    """
+    try:
+        audio = _read_audio_pyav(video_path) if _has_pyav() else _read_audio_opencv(video_path)
+    except Exception as e:
+        # The error can name server paths (the temp file), so it stays in the log
+        print(f"[Audio] Could not decode the audio track: {type(e).__name__}: {e}")
+        return {"available": False, "reason": "audio decode failed"}
+    if audio is None:
+        return {"available": False, "reason": "no audio track or no audio decoder available"}
+
+    samples, rate = audio
+    count = len(samples) // window
+    if count == 0:
+        return {"available": False, "reason": "audio track too short"}
+
+    windows = samples[:count * window].reshape(count, window)
+    rms = np.sqrt(np.mean(windows ** 2, axis=1))
+    zero_crossings = np.mean(np.abs(np.diff(np.signbit(windows), axis=1)), axis=1)
+    spectrum = np.abs(np.fft.rfft(windows * np.hanning(window), axis=1)) + 1e-10
+    flatness = np.exp(np.mean(np.log(spectrum), axis=1)) / np.mean(spectrum, axis=1)
+
+    return {
+        "available": True,
+        "duration_s": round(len(samples) / rate, 2) if rate else None,
+        "rms": round(float(rms.mean()), 5),
+        "silence_ratio": round(float(np.mean(rms < 0.01)), 4),
+        "zero_crossing_rate": round(float(zero_crossings.mean()), 4),
+        "spectral_flatness": round(float(flatness.mean()), 4),
+    }
+
+
+def combine_scores(frame_score: float, temporal: dict, weight: float) -> float:
+    """Blend the averaged frame score with the temporal score (if there is one)."""
+    if not temporal or "temporal_score" not in temporal or weight <= 0:
+        return frame_score
+    weight = min(weight, 1.0)
+    return round((1 - weight) * frame_score + weight * temporal["temporal_score"], 4)
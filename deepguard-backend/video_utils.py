@@ -1,53 +1,318 @@
-import cv2
+import atexit
 import os
+import threading
 
+from utils.frame_ring import END_OF_STREAM, RingTimeout
 
-def extract_frames(video_path):
+
+def load_cv2():
     """
-    Opens a video file with OpenCV and extracts up to 8 evenly spaced frames.
-    Saves each frame as frame_0.jpg, frame_1.jpg, etc. in deepguard-backend/.
-    Returns a list of saved file paths.
+    Import OpenCV on first use. Image-only deployments never call this,
+    so they skip the OpenCV import entirely.
     """
-    cap = cv2.VideoCapture(video_path)
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    import cv2
+
+    return cv2
+
 
+def sample_frame_indices(total_frames, max_frames=8):
+    """
+    Pick up to max_frames evenly spaced frame indices (always including
+    the first and last frame).
+    """
     if total_frames <= 0:
-        cap.release()
         return []
+    if total_frames <= max_frames:
+        return list(range(total_frames))
+    if max_frames == 1:
+        return [0]
+    return [
+        int(round(i * (total_frames - 1) / (max_frames - 1))) for i in range(max_frames)
+    ]
 
-    # Decide which frame indices to extract
-    if total_frames <= 8:
-        frame_indices = list(range(total_frames))
-    else:
-        # 8 evenly spaced: first, last, and 6 in between
-        frame_indices = [
-            int(round(i * (total_frames - 1) / 7)) for i in range(8)
-        ]
 
-    saved_paths = []
+def read_sampled_frames(video_path, max_frames=8, probe=None):
+    """
+    Opens a video file with OpenCV and yields up to max_frames evenly
+    spaced frames as BGR numpy arrays.
+    If a TemporalProbe (utils/temporal.py) is given, the frame right after
+    each sample is read too and the pair is handed to the probe, in the
+    same pass.
+    """
+    cv2 = load_cv2()
+    cap = cv2.VideoCapture(video_path)
+    try:
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        for frame_idx in sample_frame_indices(total_frames, max_frames):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+            success, frame = cap.read()
+            if not success:
+                continue
+            if probe is not None:
+                # The decoder is already positioned on the next frame
+                has_next, next_frame = cap.read()
+                if has_next:
+                    probe.add_pair(frame, next_frame)
+            yield frame
+    finally:
+        cap.release()
 
-    for count, frame_idx in enumerate(frame_indices):
-        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
-        success, frame = cap.read()
-        if not success:
-            continue
 
-        file_path = f"frame_{count}.jpg"
-        cv2.imwrite(file_path, frame)
-        saved_paths.append(file_path)
+def read_available_frames(video_path, max_frames=8, skip=()):
+    """
+    Like read_sampled_frames, but for a video that is still being uploaded:
+    yields (position, frame) for the sampled positions not in `skip`, and
+    stops at the first frame that is not in the received part of the file
+    yet. Only works when the MP4 index (moov atom) is at the start of the file.
+    """
+    cv2 = load_cv2()
+    cap = cv2.VideoCapture(video_path)
+    try:
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        for position, frame_idx in enumerate(sample_frame_indices(total_frames, max_frames)):
+            if position in skip:
+                continue
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+            success, frame = cap.read()
+            if not success:
+                break
+            yield position, frame
+    finally:
+        cap.release()
 
-    cap.release()
-    return saved_paths
 
+def fit_within(frame, max_side, min_side=0):
+    """
+    Shrink a frame so its longest side is at most max_side pixels and, if
+    min_side is set, its shortest side is at most min_side pixels.
+    """
+    height, width = frame.shape[:2]
+    scale = min(1.0, max_side / max(height, width))
+    if min_side:
+        scale = min(scale, min_side / min(height, width))
+    if scale >= 1.0:
+        return frame
+    cv2 = load_cv2()
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
 
-def cleanup_files(file_paths):
+
+def _decoder_main(jobs, ring, cancel, results):
     """
-    Deletes each file in the list if it exists.
-    Does not crash if a file is already deleted.
+    Runs in a long-lived decoder process. For every (video_path, max_frames,
+    min_side, temporal) job on the jobs queue, decode sampled frames, size
+    them with fit_within and write them into the shared ring, send the
+    temporal summary (a small dict, {} if not asked for) on results, then
+    mark the end of the stream. A None job stops the process.
     """
-    for path in file_paths:
+    try:
+        while True:
+            job = jobs.get()
+            if job is None:
+                break
+            video_path, max_frames, min_side, temporal = job
+            probe = None
+            if temporal:
+                from utils.temporal import TemporalProbe
+
+                probe = TemporalProbe()
+            signals = {}
+            try:
+                for index, frame in enumerate(read_sampled_frames(video_path, max_frames, probe)):
+                    if cancel.is_set():
+                        break
+                    ring.put(index, fit_within(frame, ring.max_side, min_side), timeout=60)
+                else:
+                    if probe is not None:
+                        signals = probe.summary()
+            except Exception as e:
+                print(f"[Decoder] Failed on {video_path}: {e}")
+            # Sent before END_OF_STREAM, so the reader finds it ready
+            results.put(signals)
+            ring.put_end(timeout=60)
+    finally:
+        ring.close()
+
+
+class _Decoder:
+    """A spawned decoder process and its frame ring, reused from video to video."""
+
+    def __init__(self, max_side, slots):
+        import multiprocessing
+        from utils.frame_ring import FrameRing
+
+        ctx = multiprocessing.get_context("spawn")
+        self.key = (max_side, slots)
+        self.ring = FrameRing(ctx, slots=slots, max_side=max_side)
+        self.jobs = ctx.SimpleQueue()
+        self.results = ctx.SimpleQueue()
+        self.cancel = ctx.Event()
+        self.healthy = True
+        self.process = ctx.Process(
+            target=_decoder_main, args=(self.jobs, self.ring, self.cancel, self.results), daemon=True
+        )
+        self.process.start()
+
+    def decode(self, video_path, on_frame, max_frames, min_side, temporal):
+        self.cancel.clear()
+        self.jobs.put((video_path, max_frames, min_side, temporal))
         try:
-            if os.path.exists(path):
-                os.remove(path)
-        except Exception:
-            pass
+            while True:
+                index, frame = self._next_frame()
+                if index is None:
+                    return {}
+                if index == END_OF_STREAM:
+                    self.ring.release()
+                    return self.results.get()
+                try:
+                    on_frame(index, frame)
+                finally:
+                    del frame
+                    self.ring.release()
+        except BaseException:
+            # Let the decoder skip the rest of this video and read up to its
+            # end marker, so the ring is lined up for the next one
+            self.cancel.set()
+            self._drain()
+            raise
+
+    def _next_frame(self):
+        while True:
+            try:
+                return self.ring.get(timeout=5)
+            except RingTimeout:
+                if self.process.is_alive():
+                    continue
+                # Decoder died without sending END_OF_STREAM
+                print("[Decoder] Decoder process exited unexpectedly")
+                self.healthy = False
+                return None, None
+
+    def _drain(self):
+        while self.healthy:
+            index, frame = self._next_frame()
+            if index is None:
+                return
+            del frame
+            self.ring.release()
+            if index == END_OF_STREAM:
+                self.results.get()
+                return
+
+    def close(self):
+        if self.process.is_alive():
+            self.jobs.put(None)
+            self.process.join(timeout=5)
+            if self.process.is_alive():
+                self.process.terminate()
+        self.ring.close()
+
+
+# Idle decoders by (max_side, slots); a video checks one out for its duration
+_idle_decoders = {}
+_decoders_lock = threading.Lock()
+_decoders_started = False
+
+
+def _acquire_decoder(max_side, slots) -> _Decoder:
+    global _decoders_started
+    with _decoders_lock:
+        idle = _idle_decoders.get((max_side, slots), [])
+        while idle:
+            decoder = idle.pop()
+            if decoder.process.is_alive():
+                return decoder
+            decoder.close()
+        if not _decoders_started:
+            _decoders_started = True
+            atexit.register(close_decoders)
+    return _Decoder(max_side, slots)
+
+
+def _release_decoder(decoder: _Decoder):
+    with _decoders_lock:
+        idle = _idle_decoders.setdefault(decoder.key, [])
+        # Keep about one idle decoder per core; extra ones from a burst exit
+        if decoder.healthy and decoder.process.is_alive() and len(idle) < (os.cpu_count() or 1):
+            idle.append(decoder)
+            return
+    decoder.close()
+
+
+def close_decoders():
+    """Stop every idle decoder process and free its shared memory."""
+    with _decoders_lock:
+        decoders = [d for idle in _idle_decoders.values() for d in idle]
+        _idle_decoders.clear()
+    for decoder in decoders:
+        decoder.close()
+
+
+def decode_frames_in_process(video_path, on_frame, max_frames=8, max_side=1024, slots=4,
+                             temporal=False, min_side=0):
+    """
+    Decode sampled frames in a separate process and call on_frame(index, frame)
+    for each one as it arrives. Frames travel through a shared-memory ring
+    (utils/frame_ring.py) as raw BGR arrays, so nothing is pickled or
+    re-encoded. The decoder also does the one fit_within resize, so frames
+    arrive ready to encode. Decoder processes are long-lived: each one keeps
+    its ring and is reused by later videos, so only the first videos pay for
+    the spawn.
+    The frame passed to on_frame is only valid during the call; copy it if
+    you need to keep it.
+    Returns the temporal signals measured by the decoder ({} unless temporal=True).
+    """
+    decoder = _acquire_decoder(max_side, slots)
+    try:
+        return decoder.decode(video_path, on_frame, max_frames, min_side, temporal)
+    finally:
+        _release_decoder(decoder)
+
+
+def frame_to_payload(frame, as_array=False, image_format="jpeg", quality=95):
+    """
+    Turn a decoded BGR frame into what a backend scores: JPEG or WebP bytes
+    for remote APIs, or an owned RGB array for backends that take raw pixels.
+    """
+    if as_array:
+        # Copying here also detaches the frame from the shared-memory slot
+        return frame[:, :, ::-1].copy()
+    cv2 = load_cv2()
+    if image_format == "webp":
+        success, buffer = cv2.imencode(".webp", frame, [cv2.IMWRITE_WEBP_QUALITY, quality])
+    else:
+        success, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buffer.tobytes() if success else None
+
+
+def for_each_frame_payload(video_path, on_payload, max_frames=8, max_side=1024,
+                           as_arrays=False, in_process=False, slots=4, temporal=False,
+                           min_side=0, image_format="jpeg", quality=95):
+    """
+    Sample frames from a video and call on_payload(index, payload) for each
+    one as soon as it is decoded. With in_process=True, decoding happens in a
+    separate process that hands frames over through shared memory (see
+    decode_frames_in_process).
+    With temporal=True, temporal signals are measured during the same decode
+    pass and returned; otherwise returns {}.
+    min_side, image_format and quality shape the payloads (see fit_within
+    and frame_to_payload).
+    """
+    def encode(index, frame):
+        payload = frame_to_payload(frame, as_arrays, image_format, quality)
+        if payload is not None:
+            on_payload(index, payload)
+
+    if in_process:
+        # The decoder process already did the one fit_within resize
+        return decode_frames_in_process(video_path, encode, max_frames, max_side, slots, temporal, min_side)
+
+    probe = None
+    if temporal:
+        from utils.temporal import TemporalProbe
+
+        probe = TemporalProbe()
+    for index, frame in enumerate(read_sampled_frames(video_path, max_frames, probe)):
+        encode(index, fit_within(frame, max_side, min_side))
+    return probe.summary() if probe is not None else {}
+
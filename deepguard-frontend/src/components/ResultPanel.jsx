@@ -54,6 +54,9 @@ export default function ResultPanel({ result, onReset }) {
                         </div>
                         <p className="text-sm font-semibold text-soft-gray mb-1 z-10 uppercase tracking-wider">Final Verdict</p>
                         <h2 className={`text-2xl font-bold ${v.color} z-10 uppercase`}>{v.label.replace(/⚠️|✅|🔍/g, '').trim()}</h2>
+                        {result.provisional && (
+                            <span className="mt-2 text-xs font-medium text-soft-gray z-10">Provisional · stopped early</span>
+                        )}
                     </div>
 
                     {/* Probability Score Card */}
@@ -1,4 +1,4 @@
-import { useState, useCallback } from 'react'
+import { useState, useCallback, useRef } from 'react'
 import { useDropzone } from 'react-dropzone'
 import { Upload, FileWarning, Loader2 } from 'lucide-react'
 
@@ -7,6 +7,8 @@ const ACCEPTED = {
     'video/*': ['.mp4', '.avi', '.mov', '.webm'],
 }
 
+const API_URL = 'https://pre-hackathon-jklu.onrender.com'
+
 const SCANNING_STEPS = [
     'Analyzing visual patterns…',
     'Running AI detection model…',
@@ -14,10 +16,39 @@ const SCANNING_STEPS = [
     'Generating feedback…',
 ]
 
+/* Read a Server-Sent Events response and call onEvent(name, data) for each event */
+async function readEvents(response, onEvent) {
+    const reader = response.body.getReader()
+    const decoder = new TextDecoder()
+    let buffer = ''
+
+    while (true) {
+        const { done, value } = await reader.read()
+        if (done) break
+        buffer += decoder.decode(value, { stream: true })
+
+        let boundary
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const chunk = buffer.slice(0, boundary)
+            buffer = buffer.slice(boundary + 2)
+            let name = 'message'
+            let data = ''
+            for (const line of chunk.split('\n')) {
+                if (line.startsWith('event:')) name = line.slice(6).trim()
+                else if (line.startsWith('data:')) data += line.slice(5).trim()
+            }
+            if (data) onEvent(name, JSON.parse(data))
+        }
+    }
+}
+
 export default function UploadCard({ onResult }) {
     const [selectedFile, setSelectedFile] = useState(null)
     const [scanning, setScanning] = useState(false)
     const [scanStep, setScanStep] = useState(0)
+    const [live, setLive] = useState(null)
+    const controllerRef = useRef(null)
+    const liveRef = useRef(null)
 
     const onDrop = useCallback((acceptedFiles) => {
         if (acceptedFiles.length > 0) {
@@ -37,6 +68,8 @@ export default function UploadCard({ onResult }) {
 
         setScanning(true)
         setScanStep(0)
+        setLive(null)
+        liveRef.current = null
         const stepInterval = setInterval(() => {
             setScanStep(prev => Math.min(prev + 1, SCANNING_STEPS.length - 1))
         }, 1500)
@@ -49,9 +82,12 @@ export default function UploadCard({ onResult }) {
 
             // Create an AbortController for timeout (120s for Render cold-start + Gemini)
             const controller = new AbortController()
+            controllerRef.current = controller
             const timeoutId = setTimeout(() => controller.abort(), 120000)
 
-            const response = await fetch('https://pre-hackathon-jklu.onrender.com/analyze', {
+            // Videos stream a running verdict after every scored frame
+            const isVideo = selectedFile.type.startsWith('video/')
+            const response = await fetch(`${API_URL}${isVideo ? '/analyze/stream' : '/analyze'}`, {
                 method: 'POST',
                 body: formData,
                 signal: controller.signal,
@@ -66,7 +102,20 @@ export default function UploadCard({ onResult }) {
                 throw new Error(`Server error: ${response.status}`)
             }
 
-            const data = await response.json()
+            let data
+            if (isVideo) {
+                await readEvents(response, (name, event) => {
+                    if (name === 'frame') {
+                        liveRef.current = event
+                        setLive(event)
+                    } else if (name === 'result') {
+                        data = event
+                    }
+                })
+                if (!data) throw new Error('Stream ended without a final result')
+            } else {
+                data = await response.json()
+            }
             console.log('[DeepGuard] Backend response:', data)
 
             clearInterval(stepInterval)
@@ -79,10 +128,22 @@ export default function UploadCard({ onResult }) {
             })
 
         } catch (error) {
-            console.error('[DeepGuard] API Error:', error)
             clearInterval(stepInterval)
             setScanning(false)
+            setLive(null)
+
+            // The user stopped early: show the verdict from the frames scored so far
+            if (error.name === 'AbortError' && controllerRef.current?.stoppedEarly && liveRef.current) {
+                onResult({
+                    verdict: liveRef.current.verdict || 'SUSPICIOUS',
+                    score: liveRef.current.score,
+                    explanation: `Provisional result from ${liveRef.current.frames_scored} analyzed frame(s). Analysis was stopped early.`,
+                    provisional: true,
+                })
+                return
+            }
 
+            console.error('[DeepGuard] API Error:', error)
             if (error.name === 'AbortError') {
                 alert('Request timed out. The backend server may be starting up (cold start). Please try again in 30 seconds.')
             } else {
@@ -91,10 +152,19 @@ export default function UploadCard({ onResult }) {
         }
     }
 
+    const handleStopEarly = () => {
+        if (controllerRef.current) {
+            controllerRef.current.stoppedEarly = true
+            controllerRef.current.abort()
+        }
+    }
+
     const handleReset = () => {
         setSelectedFile(null)
         setScanning(false)
         setScanStep(0)
+        setLive(null)
+        liveRef.current = null
     }
 
     /* ── Scanning State ── */
@@ -117,6 +187,23 @@ export default function UploadCard({ onResult }) {
                             </div>
                         ))}
                     </div>
+
+                    {/* Running verdict while video frames are scored */}
+                    {live && (
+                        <div className="mt-6 p-4 bg-gray-50 rounded-xl border border-gray-100 animate-fade-in">
+                            <p className="text-sm text-soft-gray">
+                                {live.frames_scored} frame(s) analyzed · running fake score{' '}
+                                <span className="font-semibold text-navy">{Math.round(live.score * 100)}%</span>
+                            </p>
+                            <p className="text-xs text-soft-gray mt-1">Provisional verdict: {live.verdict}</p>
+                            <button
+                                onClick={handleStopEarly}
+                                className="mt-3 text-xs font-semibold text-brand-blue hover:underline"
+                            >
+                                Stop and use current result
+                            </button>
+                        </div>
+                    )}
                 </div>
             </section>
         )